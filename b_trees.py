@@ -1,40 +1,67 @@
 # B-Trees Implementation and Methods
 
+import mmap
+import os
+import random
+import struct
+import sys
+import tempfile
+import threading
+import time
+from array import array
+from bisect import bisect_left, bisect_right
+from collections import OrderedDict
+
+# insertMany/deleteMany only take the batched path for batches of at least
+# SMALL_BATCH keys, and at least as many keys as the tree has leaves (as
+# estimated by _isBigBatch). Sorting the batch and cutting it into runs only
+# pays off once leaves get about one key each or more; smaller batches are
+# applied one key at a time
+SMALL_BATCH = 64
+
 class Node(object):
     def __init__(self, leaf=False):
         self.keys = []
         self.children = []
         self.leaf = leaf
 
+# Snapshot file layout (all integers little-endian):
+#   header - magic, format version, t, number of nodes, number of keys
+#   counts - number of keys in each node, in preorder (4 bytes each)
+#   leaves - one byte per node in the same order, 1 for a leaf
+#   keys   - the keys of every node in the same order, as signed 64-bit
+#            integers
+SNAPSHOT_MAGIC = b'BTSN'
+SNAPSHOT_VERSION = 1
+SNAPSHOT_HEADER = struct.Struct('<4sHIQQ')
+
 class BTree(object):
+    nodeType = Node # class used for new nodes (subclasses may attach extra state)
+    
     def __init__(self, t):
-        self.root = Node(True)
+        self.root = self.nodeType(True)
         self.t = t
     
     ''' SEARCHING '''
 
     # PARAMETERS
     # 'key' - key to search for
-    # 'node' - allows for recursive calling on tree
+    # 'node' - node to start the search from (defaults to the root)
     def searchBTree(self, key, node=None):
         # if node is not specified, start at root
         node = self.root if node == None else node
         
-        i = 0
-        # iterate through each key in the node, continuing while
-        # the key we're searching for is greater than the node's keys
-        while i < len(node.keys) and key > node.keys[i]:
-            i += 1
-        # found key at node
-        if i < len(node.keys) and key == node.keys[i]:
-            return (node, i)
-        # key is not in tree
-        elif node.leaf:
-            return None
-        # search child node
-        else:
-            # 'i' helps to decide which subtree we should traverse next
-            return self.searchBTree(key, node.children[i])
+        while True:
+            # binary search for the first key in the node that is >= key
+            i = bisect_left(node.keys, key)
+            # found key at node
+            if i < len(node.keys) and key == node.keys[i]:
+                return (node, i)
+            # key is not in tree
+            elif node.leaf:
+                return None
+            # 'i' decides which subtree we should traverse next
+            node = node.children[i]
     
     ''' SPLITTING AND INSERTING NODES '''
 
@@ -45,7 +72,7 @@ class BTree(object):
     def splitChild(self, x, i):
         t = self.t # t is the min degree of the b-tree
         y = x.children[i] # y is full child to split
-        z = Node(y.leaf) # make new node to hold half of keys
+        z = self.nodeType(y.leaf) # make new node to hold half of keys
         x.children.insert(i+1, z) 
         x.keys.insert(i, y.keys[t-1]) # the median key of y is moved up to x
 
@@ -69,7 +96,7 @@ class BTree(object):
         
         # check if root is full (i.e. it has 2t-1 keys)
         if len(root.keys) == (2*t) - 1:
-            newRoot = Node() # create empty node 
+            newRoot = self.nodeType() # create empty node 
             self.root = newRoot # set tree's root to new node
             newRoot.children.insert(0, root) # add old root as child of new root
             self.splitChild(newRoot, 0) # split old root into two nodes
@@ -82,31 +109,388 @@ class BTree(object):
     # 'k' is value we're inserting
     def insertNonFull(self, x, k):
         t = self.t # t is the min degree of the b-tree
-        i = len(x.keys) - 1 # index of last key in node x
         
-        # if x is a leaf, k is inserted directly into x.keys
-        if x.leaf:
-            x.keys.append(None) # add None key to end of keys as placeholder
-            # move keys greater than k one position to the right
-            while i >= 0 and k < x.keys[i]:
-                x.keys[i+1] = x.keys[i]
-                i -= 1
-            x.keys[i+1] = k # insert new key at correct position
-        # if x is not a leaf, k is inserted into the appropriate child of x
-        else:
+        # while x is not a leaf, k is inserted into the appropriate child of x
+        while not x.leaf:
             # find the child that is going to have the new key
-            while i >= 0 and k < x.keys[i]:
-                i -= 1
-            i += 1 # increment i to point to the appropriate child of 'x' into which k should be inserted
+            # (the first child whose keys may be greater than k)
+            i = bisect_right(x.keys, k)
             # if the found child is full
             if len(x.children[i].keys) == (2*t)-1:
                 self.splitChild(x, i) # split the child
                 if k > x.keys[i]: # if k is greater than the new key moved up to 'x' during the split,
                     i += 1 # increment i to point to new child that should contain k
-            self.insertNonFull(x.children[i], k) # call insertNonFull recursively on the child
+            x = x.children[i] # descend; the child is guaranteed to be non-full
         
+        # x is a leaf, so k is inserted directly into x.keys after any equal keys
+        x.keys.insert(bisect_right(x.keys, k), k)
+        
+    ''' BULK LOADING '''
+
+    # PARAMETERS
+    # 'keys' - keys in nondecreasing order
+    # 't' - min degree of the b-tree
+    # 'fill' - fraction of the 2t-1 key slots to use in each node (0 < fill <= 1)
+    # builds the tree bottom-up in one pass: the keys are cut into leaves, the
+    # key between two neighbouring leaves moves up as their separator, and the
+    # separators are packed into the next level in the same way
+    @classmethod
+    def bulkLoad(cls, keys, t, fill=1.0):
+        if not 0 < fill <= 1:
+            raise ValueError("fill must be in (0, 1]")
+        keys = list(keys)
+        for i in range(1, len(keys)):
+            if keys[i] < keys[i-1]:
+                raise ValueError("bulkLoad needs keys in sorted order")
+        tree = cls(t)
+        cap = max(t - 1, min(2*t - 1, round(fill * (2*t - 1))))
+        nodes, seps = tree._packLevel(keys, None, cap)
+        while len(nodes) > 1:
+            nodes, seps = tree._packLevel(seps, nodes, cap)
+        tree.root = nodes[0]
+        return tree
+
+    # PARAMETERS
+    # 'keys' - sorted keys for this level
+    # 'children' - nodes of the level below (len(keys)+1 of them), or None for leaves
+    # 'cap' - target number of keys per node
+    # returns the nodes of this level and the separator keys between them
+    def _packLevel(self, keys, children, cap):
+        t = self.t
+        n = len(keys)
+        # m nodes use up n-(m-1) keys, so each node plus the separator after
+        # it covers (n+1)/m keys; keep that between t and 2t
+        m = -(-(n+1) // (cap+1))
+        if m > 1 and (n+1) // m < t:
+            m -= 1
+        base, extra = divmod(n+1, m)
+        nodes = []
+        seps = []
+        pos = 0
+        for g in range(m):
+            size = base - 1 + (1 if g < extra else 0)
+            node = self.nodeType(children is None)
+            node.keys = keys[pos:pos+size]
+            if children is not None:
+                node.children = children[pos:pos+size+1]
+            pos += size
+            nodes.append(node)
+            if g < m - 1:
+                seps.append(keys[pos])
+                pos += 1
+        return nodes, seps
+
+    ''' BATCHED INSERTING AND DELETING '''
+
+    # PARAMETERS
+    # 'keys' - keys to insert, in any order
+    # the batch is sorted and each child is handed the run of keys that falls
+    # between its separators, so a node is visited once per batch no matter
+    # how many of the keys end up in it. Nodes that overflow are split into
+    # as many nodes as needed on the way back up
+    def insertMany(self, keys):
+        keys = sorted(keys)
+        if not self._isBigBatch(len(keys)):
+            for k in keys:
+                self.insert(k)
+            return
+        nodes, seps = self._insertRun(self.root, keys)
+        # the root itself may have been split; add levels until one node is left
+        while len(nodes) > 1:
+            nodes, seps = self._packLevel(seps, nodes, 2*self.t - 1)
+        self.root = nodes[0]
+
+    # returns True if a batch of n keys should take the batched path. The
+    # number of leaves is estimated from the fan-out along the leftmost path
+    def _isBigBatch(self, n):
+        if n < SMALL_BATCH:
+            return False
+        leaves = 1
+        x = self.root
+        while not x.leaf:
+            leaves *= len(x.children)
+            x = x.children[0]
+        return n >= leaves
+
+    # PARAMETERS
+    # 'x' - node whose subtree receives the keys
+    # 'keys' - sorted keys that belong in x's subtree
+    # returns the node(s) that replace x and the separators between them
+    def _insertRun(self, x, keys):
+        if x.leaf:
+            # both lists are sorted, so this is a linear merge
+            x.keys = sorted(x.keys + keys)
+        else:
+            # only the children between the ones holding the smallest and
+            # largest key of the batch are touched
+            first = bisect_right(x.keys, keys[0])
+            last = bisect_right(x.keys, keys[-1])
+            runs = []
+            lo = 0
+            for i in range(first, last + 1):
+                # keys equal to a separator go right, as in insertNonFull
+                hi = bisect_left(keys, x.keys[i], lo) if i < last else len(keys)
+                runs.append(keys[lo:hi])
+                lo = hi
+            # right to left, so splicing in split children keeps lower indices valid
+            for i in range(last, first - 1, -1):
+                run = runs[i - first]
+                if run:
+                    nodes, seps = self._insertRun(x.children[i], run)
+                    x.children[i:i+1] = nodes
+                    x.keys[i:i] = seps
+        if len(x.keys) <= 2*self.t - 1:
+            return [x], []
+        return self._packLevel(x.keys, None if x.leaf else x.children, 2*self.t - 1)
+
+    # PARAMETERS
+    # 'k' - key to delete (removes one copy)
+    # returns True if the key was found and removed
+    # a key in an internal node is replaced by its predecessor, which always
+    # comes out of a leaf; then every node on the path that fell below t-1
+    # keys is fixed on the way back up, stopping at the first one that didn't
+    def delete(self, k):
+        t = self.t
+        path = [] # (node, index of the child the path continues into)
+        x = self.root
+        while True:
+            i = bisect_left(x.keys, k)
+            if i < len(x.keys) and x.keys[i] == k:
+                break
+            if x.leaf:
+                return False
+            path.append((x, i))
+            x = x.children[i]
+        if x.leaf:
+            del x.keys[i]
+        else:
+            path.append((x, i))
+            y = x.children[i]
+            while not y.leaf:
+                path.append((y, len(y.children) - 1))
+                y = y.children[-1]
+            x.keys[i] = y.keys.pop()
+        for parent, i in reversed(path):
+            if len(parent.children[i].keys) >= t - 1:
+                break
+            self._rebalanceChildren(parent, i, i)
+        # a merge may have emptied the root, which makes the tree shorter
+        while not self.root.leaf and not self.root.keys:
+            self.root = self.root.children[0]
+        return True
+
+    # PARAMETERS
+    # 'keys' - keys to delete, in any order (each removes at most one copy)
+    # returns the number of keys that were found and removed
+    def deleteMany(self, keys):
+        keys = sorted(keys)
+        if not self._isBigBatch(len(keys)):
+            return sum(self.delete(k) for k in keys)
+        missing = self._deleteRun(self.root, keys)
+        # merges may have emptied the root, which makes the tree shorter
+        while not self.root.leaf and not self.root.keys:
+            self.root = self.root.children[0]
+        return len(keys) - len(missing)
+
+    # PARAMETERS
+    # 'x' - node whose subtree the keys are deleted from
+    # 'keys' - sorted keys to delete
+    # returns the keys that weren't found. Afterwards x's children have at
+    # least t-1 keys each (x itself may underflow, which its parent fixes)
+    def _deleteRun(self, x, keys):
+        if x.leaf:
+            kept = []
+            missing = []
+            j = 0
+            for key in x.keys:
+                while j < len(keys) and keys[j] < key:
+                    missing.append(keys[j])
+                    j += 1
+                if j < len(keys) and keys[j] == key:
+                    j += 1
+                else:
+                    kept.append(key)
+            missing.extend(keys[j:])
+            x.keys = kept
+            return missing
+
+        # cut the batch into one run per child it touches; a key equal to a
+        # separator deletes the separator itself, and further copies go right
+        first = bisect_left(x.keys, keys[0])
+        last = bisect_right(x.keys, keys[-1])
+        runs = []
+        dropped = []
+        lo = 0
+        for i in range(first, last):
+            hi = bisect_left(keys, x.keys[i], lo)
+            runs.append(keys[lo:hi])
+            if hi < len(keys) and keys[hi] == x.keys[i]:
+                dropped.append(i)
+                hi += 1
+            lo = hi
+        runs.append(keys[lo:])
+
+        # splits may leave copies of a separator on either side of it, so
+        # children go right to left and copies missing on the right are
+        # retried on the left
+        missing = []
+        carry = []
+        for i in range(last, first - 1, -1):
+            run = runs[i - first] + carry
+            notFound = self._deleteRun(x.children[i], run) if run else []
+            carry = []
+            for key in notFound:
+                if i > first and key == x.keys[i-1]:
+                    carry.append(key)
+                else:
+                    missing.append(key)
+
+        # refill each deleted separator with its predecessor (or successor),
+        # going right to left so the lower indices stay valid
+        for i in reversed(dropped):
+            key = self._popMax(x.children[i])
+            if key is None:
+                key = self._popMin(x.children[i+1])
+            if key is not None:
+                x.keys[i] = key
+            else:
+                # both subtrees are empty and have the same height, keep one
+                del x.keys[i]
+                del x.children[i+1]
+                last -= 1
+        self._rebalanceChildren(x, first, last)
+        return missing
+
+    # removes and returns the largest key in x's subtree (None if it's empty)
+    def _popMax(self, x):
+        if x.leaf:
+            return x.keys.pop() if x.keys else None
+        key = self._popMax(x.children[-1])
+        if key is None:
+            if not x.keys:
+                return None
+            # the last subtree is empty, so the last separator is the maximum
+            x.children.pop()
+            return x.keys.pop()
+        self._rebalanceChildren(x, len(x.children) - 1)
+        return key
+
+    # removes and returns the smallest key in x's subtree (None if it's empty)
+    def _popMin(self, x):
+        if x.leaf:
+            return x.keys.pop(0) if x.keys else None
+        key = self._popMin(x.children[0])
+        if key is None:
+            if not x.keys:
+                return None
+            x.children.pop(0)
+            return x.keys.pop(0)
+        self._rebalanceChildren(x, 0, 0)
+        return key
+
+    # PARAMETERS
+    # 'x' - internal node whose children may have fewer than t-1 keys
+    # 'lo', 'hi' - range of children that may be underfull (defaults to all)
+    # an underfull child is merged with a neighbour through the separator
+    # between them; if the merged node is too big it is split evenly again,
+    # which amounts to borrowing keys from the neighbour
+    def _rebalanceChildren(self, x, lo=0, hi=None):
+        t = self.t
+        if hi is None:
+            hi = len(x.children) - 1
+        i = lo
+        while i <= hi and len(x.children) > 1:
+            if len(x.children[i].keys) >= t - 1:
+                i += 1
+                continue
+            a = i if i + 1 < len(x.children) else i - 1
+            left = x.children[a]
+            right = x.children[a+1]
+            keys = left.keys + [x.keys[a]] + right.keys
+            children = None if left.leaf else left.children + right.children
+            nodes, seps = self._packLevel(keys, children, 2*t - 1)
+            x.children[a:a+2] = nodes
+            x.keys[a:a+1] = seps
+            # an underfull child may have been underfull all the way down
+            if children is not None:
+                for node in nodes:
+                    self._rebalanceChildren(node)
+            # recheck the merged node(s) and keep the range in step
+            hi = max(hi + len(nodes) - 2, a + len(nodes) - 1)
+            i = a
+
+    ''' SNAPSHOTS '''
+
+    # Writes the tree to 'path' in the snapshot format described above
+    def saveSnapshot(self, path):
+        counts = array('I')
+        leaves = array('B')
+        keys = array('q')
+        stack = [self.root]
+        while stack:
+            x = stack.pop()
+            counts.append(len(x.keys))
+            leaves.append(1 if x.leaf else 0)
+            keys.extend(x.keys)
+            if not x.leaf:
+                stack.extend(reversed(x.children))
+        if sys.byteorder == 'big':
+            counts.byteswap()
+            keys.byteswap()
+        with open(path, 'wb') as f:
+            f.write(SNAPSHOT_HEADER.pack(SNAPSHOT_MAGIC, SNAPSHOT_VERSION,
+                                         self.t, len(counts), len(keys)))
+            counts.tofile(f)
+            leaves.tofile(f)
+            keys.tofile(f)
+
+    # PARAMETERS
+    # 'path' - file written by saveSnapshot
+    # returns the tree, rebuilt in one pass over the file: every node gets its
+    # keys as stored, so no comparisons or splits are needed
+    @classmethod
+    def loadSnapshot(cls, path):
+        with open(path, 'rb') as f:
+            header = f.read(SNAPSHOT_HEADER.size)
+            if len(header) == SNAPSHOT_HEADER.size:
+                magic, version, t, nodeCount, keyCount = SNAPSHOT_HEADER.unpack(header)
+            if len(header) < SNAPSHOT_HEADER.size or magic != SNAPSHOT_MAGIC or version != SNAPSHOT_VERSION:
+                raise ValueError(f"{path} is not a B-tree snapshot")
+            # the arrays are filled straight from the file
+            counts = array('I')
+            leaves = array('B')
+            keys = array('q')
+            try:
+                counts.fromfile(f, nodeCount)
+                leaves.fromfile(f, nodeCount)
+                keys.fromfile(f, keyCount)
+            except (EOFError, ValueError): # ValueError if it ends mid-item
+                raise ValueError(f"{path} is truncated")
+        if sys.byteorder == 'big':
+            counts.byteswap()
+            keys.byteswap()
+        tree = cls(t)
+        pos = 0
+        # internal nodes that are still missing some of their children; in
+        # preorder the next node is always a child of the last one
+        parents = []
+        for count, leaf in zip(counts, leaves):
+            x = tree.nodeType(bool(leaf))
+            x.keys = keys[pos:pos + count].tolist()
+            pos += count
+            if parents:
+                parent = parents[-1]
+                parent.children.append(x)
+                if len(parent.children) == len(parent.keys) + 1:
+                    parents.pop()
+            else:
+                tree.root = x
+            if not leaf:
+                parents.append(x)
+        return tree
+
     ''' PRINTING '''
-    
+
     def _printTree(self, node, indent=0):
         # print the node keys with appropriate indentation
         print(' ' * indent, node.keys)
@@ -118,7 +502,899 @@ class BTree(object):
 
     def printTree(self):
         self._printTree(self.root)
-    
+
+# B+ tree: internal nodes only hold copies of keys to route searches, while
+# every key and its value lives in a leaf. Leaves are linked left to right,
+# so a range scan finds its first leaf and then just follows the links.
+
+class BPlusNode(Node):
+    def __init__(self, leaf=False):
+        super().__init__(leaf)
+        self.values = [] # values[i] belongs to keys[i] (leaves only)
+        self.next = None # leaf to the right of this one (leaves only)
+
+class BPlusTree(object):
+    def __init__(self, t):
+        self.root = BPlusNode(True)
+        self.t = t
+
+    ''' SEARCHING '''
+
+    # PARAMETERS
+    # 'key' - key to find the leaf for
+    # returns the leaf whose key range contains 'key'
+    def _findLeaf(self, key):
+        node = self.root
+        while not node.leaf:
+            # keys equal to a separator live in the right subtree
+            node = node.children[bisect_right(node.keys, key)]
+        return node
+
+    # PARAMETERS
+    # 'key' - key to search for
+    # returns (leaf, index) of the key, or None if it isn't in the tree
+    def searchBPlusTree(self, key):
+        leaf = self._findLeaf(key)
+        i = bisect_left(leaf.keys, key)
+        if i < len(leaf.keys) and leaf.keys[i] == key:
+            return (leaf, i)
+        return None
+
+    # PARAMETERS
+    # 'lo', 'hi' - inclusive bounds of the scan (None leaves that end open)
+    # yields (key, value) pairs in key order, one leaf at a time
+    def rangeScan(self, lo=None, hi=None):
+        if lo is None:
+            leaf = self.root
+            while not leaf.leaf:
+                leaf = leaf.children[0]
+            i = 0
+        else:
+            leaf = self._findLeaf(lo)
+            i = bisect_left(leaf.keys, lo)
+        while leaf is not None:
+            keys = leaf.keys
+            values = leaf.values
+            while i < len(keys):
+                if hi is not None and keys[i] > hi:
+                    return
+                yield (keys[i], values[i])
+                i += 1
+            leaf = leaf.next
+            i = 0
+
+    ''' SPLITTING AND INSERTING NODES '''
+
+    # PARAMETERS
+    # 'x' - non-full internal node whose child at index 'i' is full
+    # 'i' - index of full child
+    def splitChild(self, x, i):
+        t = self.t
+        y = x.children[i]
+        z = BPlusNode(y.leaf)
+        x.children.insert(i+1, z)
+        if y.leaf:
+            # a leaf keeps all of its keys: the right half moves to z and a
+            # copy of z's first key goes up to x as the separator
+            z.keys = y.keys[t-1:]
+            z.values = y.values[t-1:]
+            y.keys = y.keys[:t-1]
+            y.values = y.values[:t-1]
+            x.keys.insert(i, z.keys[0])
+            # link z into the leaf chain right after y
+            z.next = y.next
+            y.next = z
+        else:
+            # internal nodes split like in BTree, the median moves up to x
+            x.keys.insert(i, y.keys[t-1])
+            z.keys = y.keys[t:]
+            y.keys = y.keys[:t-1]
+            z.children = y.children[t:]
+            y.children = y.children[:t]
+
+    # PARAMETERS
+    # 'k' - key to insert
+    # 'value' - value stored with the key (replaces the old value if k exists)
+    def insert(self, k, value=None):
+        t = self.t
+        root = self.root
+        if len(root.keys) == (2*t) - 1:
+            newRoot = BPlusNode()
+            self.root = newRoot
+            newRoot.children.insert(0, root)
+            self.splitChild(newRoot, 0)
+        x = self.root
+        # split full nodes on the way down, so the leaf we reach has room
+        while not x.leaf:
+            i = bisect_right(x.keys, k)
+            if len(x.children[i].keys) == (2*t) - 1:
+                self.splitChild(x, i)
+                if k >= x.keys[i]:
+                    i += 1
+            x = x.children[i]
+        i = bisect_left(x.keys, k)
+        if i < len(x.keys) and x.keys[i] == k:
+            x.values[i] = value
+        else:
+            x.keys.insert(i, k)
+            x.values.insert(i, value)
+
+    ''' PRINTING '''
+
+    def _printTree(self, node, indent=0):
+        print(' ' * indent, node.keys)
+        if not node.leaf:
+            for child in node.children:
+                self._printTree(child, indent + 4)
+
+    def printTree(self):
+        self._printTree(self.root)
+
+# Concurrent B-tree. Writers use latch crabbing: a writer latches a child
+# before letting go of its parent, and because insert splits full nodes on
+# the way down, the child it steps into can never split upward, so the
+# parent is released right away and a writer holds at most two latches at a
+# time. Readers take no latches at all. Every node has a version number that
+# writers bump while they hold its latch, and a reader checks that a node's
+# version didn't change while it was looking at the node (optimistic lock
+# coupling). If it did, the reader starts over from the root. The root
+# pointer only changes while the old root is latched, so no separate latch
+# is needed for it.
+
+class Latch(object):
+    # exclusive latch with a version number for optimistic readers. The
+    # version is odd while a writer holds the latch and goes up by two for
+    # every write, so a reader that sees the same even version before and
+    # after reading a node knows no writer touched the node in between
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.version = 0
+
+    def acquireExclusive(self):
+        self.lock.acquire()
+        self.version += 1
+
+    def releaseExclusive(self):
+        self.version += 1
+        self.lock.release()
+
+    # blocks until the writer holding the latch, if any, has released it
+    def wait(self):
+        with self.lock:
+            pass
+
+class LatchedNode(Node):
+    def __init__(self, leaf=False):
+        super().__init__(leaf)
+        self.latch = Latch()
+
+class ConcurrentBTree(BTree):
+    nodeType = LatchedNode
+
+    ''' SEARCHING '''
+
+    # PARAMETERS
+    # 'key' - key to search for
+    # returns (node, index) like BTree.searchBTree, or None
+    def searchBTree(self, key):
+        while True:
+            node = self.root
+            latch = node.latch
+            version = latch.version
+            if version & 1 or node is not self.root:
+                latch.wait()
+                continue
+            result = None
+            restart = False
+            try:
+                while True:
+                    keys = node.keys
+                    i = bisect_left(keys, key)
+                    if i < len(keys) and key == keys[i]:
+                        result = (node, i)
+                        break
+                    if node.leaf:
+                        break
+                    child = node.children[i]
+                    childLatch = child.latch
+                    childVersion = childLatch.version
+                    # the child is only known to be the right one if the
+                    # parent didn't change after the child's version was read
+                    if childVersion & 1 or latch.version != version:
+                        childLatch.wait()
+                        restart = True
+                        break
+                    node, latch, version = child, childLatch, childVersion
+            except IndexError:
+                # a writer changed the node halfway through
+                restart = True
+            if not restart and latch.version == version:
+                return result
+
+    ''' INSERTING '''
+
+    # PARAMETERS
+    # 'k' - value to insert
+    def insert(self, k):
+        # most inserts go into a leaf with room to spare: find it like a
+        # reader would and latch only the leaf
+        leaf, version = self._findLeaf(k)
+        if leaf is not None:
+            leaf.latch.acquireExclusive()
+            # version + 1 means only our own acquire changed it
+            if leaf.latch.version == version + 1 and len(leaf.keys) < (2*self.t) - 1:
+                leaf.keys.insert(bisect_right(leaf.keys, k), k)
+                leaf.latch.releaseExclusive()
+                return
+            leaf.latch.releaseExclusive()
+
+        # otherwise split full nodes on the way down, crabbing from the root
+        t = self.t
+        x = self._latchRoot()
+        if len(x.keys) == (2*t) - 1:
+            # the new root is only reachable through self.root, which can't
+            # change while we hold the old root
+            newRoot = self.nodeType()
+            newRoot.latch.acquireExclusive()
+            newRoot.children.insert(0, x)
+            self.splitChild(newRoot, 0)
+            self.root = newRoot
+            x.latch.releaseExclusive()
+            x = newRoot
+
+        while not x.leaf:
+            i = bisect_right(x.keys, k)
+            child = x.children[i]
+            child.latch.acquireExclusive()
+            if len(child.keys) == (2*t) - 1:
+                # the new sibling is only reachable through x, which we hold
+                self.splitChild(x, i)
+                if k > x.keys[i]:
+                    i += 1
+                    sibling = x.children[i]
+                    sibling.latch.acquireExclusive()
+                    child.latch.releaseExclusive()
+                    child = sibling
+            # child is non-full now, so nothing below it can split into x
+            x.latch.releaseExclusive()
+            x = child
+        x.keys.insert(bisect_right(x.keys, k), k)
+        x.latch.releaseExclusive()
+
+    # PARAMETERS
+    # 'k' - key to insert
+    # returns (leaf k belongs in, version of the leaf when it was reached),
+    # or (None, None) if a writer got in the way
+    def _findLeaf(self, k):
+        node = self.root
+        version = node.latch.version
+        if version & 1 or node is not self.root:
+            return None, None
+        try:
+            while not node.leaf:
+                child = node.children[bisect_right(node.keys, k)]
+                childVersion = child.latch.version
+                if childVersion & 1 or node.latch.version != version:
+                    return None, None
+                node, version = child, childVersion
+        except IndexError:
+            return None, None
+        return node, version
+
+    # returns the root, latched exclusively
+    def _latchRoot(self):
+        while True:
+            x = self.root
+            x.latch.acquireExclusive()
+            # the root may have been replaced while we waited for its latch
+            if x is self.root:
+                return x
+            x.latch.releaseExclusive()
+
+    ''' DELETING '''
+
+    # Deletion is done top down in one pass, as in CLRS: before stepping
+    # into a child, the child is given at least t keys (borrowing one from a
+    # sibling, or merging with a sibling), so the delete at the bottom can
+    # never make a node above it underflow. Like insert, that lets a writer
+    # release each node once it has moved on to the child. The exception is
+    # a key found in an internal node: it is replaced by its predecessor or
+    # successor, so that node stays latched until the replacement has been
+    # taken out of a leaf further down.
+
+    # PARAMETERS
+    # 'k' - key to delete (removes one copy)
+    # returns True if the key was found and removed
+    def delete(self, k):
+        t = self.t
+        x = self._latchRoot()
+        hole = None # (node, index) of a key waiting for its replacement
+        mode = 0 # 0 looks for k, -1 takes the max and 1 the min of x's subtree
+        while not x.leaf:
+            if mode == 0:
+                i = bisect_left(x.keys, k)
+                if i < len(x.keys) and x.keys[i] == k:
+                    y = x.children[i]
+                    z = x.children[i+1]
+                    y.latch.acquireExclusive()
+                    if len(y.keys) >= t:
+                        # replace k with its predecessor
+                        hole, mode, child = (x, i), -1, y
+                    else:
+                        z.latch.acquireExclusive()
+                        if len(z.keys) >= t:
+                            # replace k with its successor
+                            y.latch.releaseExclusive()
+                            hole, mode, child = (x, i), 1, z
+                        else:
+                            # both neighbours are minimal: merge them around k
+                            # and keep looking for k in the merged node
+                            y.keys += [x.keys.pop(i)] + z.keys
+                            y.children += z.children
+                            del x.children[i+1]
+                            z.latch.releaseExclusive()
+                            child = y
+                else:
+                    x.children[i].latch.acquireExclusive()
+                    child = x.children[self._growChild(x, i)]
+            else:
+                i = len(x.children) - 1 if mode == -1 else 0
+                x.children[i].latch.acquireExclusive()
+                child = x.children[self._growChild(x, i)]
+            # a merge of the root's only two children leaves it empty
+            if x is self.root and not x.keys:
+                self.root = child
+            if hole is None or hole[0] is not x:
+                x.latch.releaseExclusive()
+            x = child
+
+        found = True
+        if mode == 0:
+            i = bisect_left(x.keys, k)
+            if i < len(x.keys) and x.keys[i] == k:
+                del x.keys[i]
+            else:
+                found = False
+        else:
+            node, i = hole
+            node.keys[i] = x.keys.pop() if mode == -1 else x.keys.pop(0)
+            node.latch.releaseExclusive()
+        x.latch.releaseExclusive()
+        return found
+
+    # PARAMETERS
+    # 'x' - internal node, latched exclusively
+    # 'i' - index of a child of x, also latched exclusively
+    # gives the child at least t keys if it has fewer: it takes a key
+    # through x from a sibling that can spare one, or else is merged with a
+    # sibling. Siblings are only latched while this happens.
+    # returns the index of the child to step into, which is left latched
+    def _growChild(self, x, i):
+        t = self.t
+        c = x.children[i]
+        if len(c.keys) >= t:
+            return i
+        left = x.children[i-1] if i > 0 else None
+        if left is not None:
+            left.latch.acquireExclusive()
+            if len(left.keys) >= t:
+                c.keys.insert(0, x.keys[i-1])
+                x.keys[i-1] = left.keys.pop()
+                if not c.leaf:
+                    c.children.insert(0, left.children.pop())
+                left.latch.releaseExclusive()
+                return i
+        if i + 1 < len(x.children):
+            right = x.children[i+1]
+            right.latch.acquireExclusive()
+            if len(right.keys) >= t:
+                c.keys.append(x.keys[i])
+                x.keys[i] = right.keys.pop(0)
+                if not c.leaf:
+                    c.children.append(right.children.pop(0))
+            else:
+                c.keys += [x.keys.pop(i)] + right.keys
+                c.children += right.children
+                del x.children[i+1]
+            right.latch.releaseExclusive()
+            if left is not None:
+                left.latch.releaseExclusive()
+            return i
+        # c is the last child and its left sibling is minimal too
+        left.keys += [x.keys.pop(i-1)] + c.keys
+        left.children += c.children
+        del x.children[i]
+        c.latch.releaseExclusive()
+        return i - 1
+
+    # batches are applied one key at a time so every change still goes
+    # through latch crabbing
+    def insertMany(self, keys):
+        for k in sorted(keys):
+            self.insert(k)
+
+    def deleteMany(self, keys):
+        return sum(self.delete(k) for k in sorted(keys))
+
+# Baseline for ConcurrentBTree: a plain BTree behind one global lock, so
+# only one thread uses the tree at a time. The lock is reentrant because
+# small batches fall back to insert and delete.
+
+class LockedBTree(BTree):
+    def __init__(self, t):
+        super().__init__(t)
+        self.lock = threading.RLock()
+
+    def searchBTree(self, key):
+        with self.lock:
+            return super().searchBTree(key)
+
+    def insert(self, k):
+        with self.lock:
+            super().insert(k)
+
+    def delete(self, k):
+        with self.lock:
+            return super().delete(k)
+
+    def insertMany(self, keys):
+        with self.lock:
+            super().insertMany(keys)
+
+    def deleteMany(self, keys):
+        with self.lock:
+            return super().deleteMany(keys)
+
+# PARAMETERS
+# 'readers' - number of reader threads
+# 'writers' - number of writer threads
+# 'n' - number of keys each writer inserts
+# 'treeType' - ConcurrentBTree, or LockedBTree for the global-lock baseline
+# 'timeLimit' - seconds after which the writers stop, even if they haven't
+#   inserted all of their keys. Under the GIL, readers that hold a global
+#   lock most of the time can starve the writers for minutes
+# each writer inserts its own keys and records how far it has got, while the
+# readers keep looking up keys that are already known to be inserted.
+# returns (lookups per second of all readers together, lookups per second
+# of each reader, inserts per second of all writers together)
+def stressConcurrentBTree(readers, writers, n, t=16, treeType=ConcurrentBTree, timeLimit=5.0):
+    tree = treeType(t)
+    progress = [0] * writers # number of keys writer w has finished inserting
+    lookups = [0] * readers
+    errors = []
+    done = threading.Event()
+
+    def write(w):
+        for j in range(n):
+            if time.time() > deadline:
+                break
+            tree.insert(j * writers + w)
+            progress[w] = j + 1
+
+    def read(r):
+        rng = random.Random(r)
+        count = 0
+        while not done.is_set():
+            w = rng.randrange(writers)
+            if progress[w] == 0:
+                continue
+            key = rng.randrange(progress[w]) * writers + w
+            if tree.searchBTree(key) is None:
+                errors.append(key)
+            count += 1
+        lookups[r] = count
+
+    writerThreads = [threading.Thread(target=write, args=(w,)) for w in range(writers)]
+    readerThreads = [threading.Thread(target=read, args=(r,)) for r in range(readers)]
+    startTime = time.time()
+    deadline = startTime + timeLimit
+    for thread in readerThreads + writerThreads:
+        thread.start()
+    for thread in writerThreads:
+        thread.join()
+    done.set()
+    for thread in readerThreads:
+        thread.join()
+    elapsed = time.time() - startTime
+
+    if errors:
+        raise AssertionError(f"readers missed {len(errors)} inserted keys, e.g. {errors[0]}")
+    missing = [j * writers + w for w in range(writers) for j in range(progress[w])
+               if tree.searchBTree(j * writers + w) is None]
+    if missing:
+        raise AssertionError(f"{len(missing)} keys were lost, e.g. {missing[0]}")
+    return sum(lookups) / elapsed, sum(lookups) / elapsed / readers, sum(progress) / elapsed
+
+# Read scaling
+# Lookups are pure Python, so under the GIL only one thread runs them at a
+# time, whatever the latches allow. The most all readers together can
+# manage is what a single thread gets from a plain BTree (no latches), and
+# every extra thread only splits that between more threads. An optimistic
+# lookup takes no locks, it only reads one version number per level, so it
+# costs about as much as a lookup in a LockedBTree, which takes one lock
+# per lookup. Reads can only really scale on a free-threaded build of
+# Python, where the global lock would serialize them and the optimistic
+# reads would not.
+
+# PARAMETERS
+# 'readers' - number of reader threads (0 times a plain BTree in the
+#   calling thread instead, which is the ceiling under the GIL)
+# 'n' - number of keys in the tree
+# 'duration' - seconds to run the readers for
+# 'treeType' - ConcurrentBTree, or LockedBTree for the global-lock baseline
+# returns (lookups per second of all readers together, lookups per second
+# of each reader)
+def getReadScaling(readers, n, duration=1.0, t=16, treeType=ConcurrentBTree):
+    keys = list(range(n))
+    random.shuffle(keys)
+    if readers == 0:
+        tree = BTree(t)
+        tree.insertMany(keys)
+        rng = random.Random(0)
+        count = 0
+        startTime = time.time()
+        while time.time() - startTime < duration:
+            for _ in range(1000):
+                tree.searchBTree(rng.randrange(n))
+            count += 1000
+        rate = count / (time.time() - startTime)
+        return rate, rate
+    tree = treeType(t)
+    tree.insertMany(keys)
+    lookups = [0] * readers
+    done = threading.Event()
+
+    def read(r):
+        rng = random.Random(r)
+        count = 0
+        while not done.is_set():
+            tree.searchBTree(rng.randrange(n))
+            count += 1
+        lookups[r] = count
+
+    threads = [threading.Thread(target=read, args=(r,)) for r in range(readers)]
+    startTime = time.time()
+    for thread in threads:
+        thread.start()
+    time.sleep(duration)
+    done.set()
+    for thread in threads:
+        thread.join()
+    elapsed = time.time() - startTime
+    return sum(lookups) / elapsed, sum(lookups) / elapsed / readers
+
+# Disk-backed B-tree: every node lives in one fixed-size page of a
+# memory-mapped file, and only a bounded number of nodes are kept
+# deserialized in memory at a time (the buffer pool).
+#
+# File layout:
+#   page 0      - file header (magic, version, page size, t, root page, page count)
+#   page 1..n   - one node per page
+# Node page layout:
+#   leaf flag (1 byte), number of keys (2 bytes), keys (8 bytes each, room
+#   for 2t-1 of them), child page numbers (8 bytes each)
+# Keys are stored as signed 64-bit integers.
+
+PAGE_MAGIC = b'BTPG'
+PAGE_VERSION = 1
+FILE_HEADER = struct.Struct('<4sHIIQQ')
+NODE_HEADER = struct.Struct('<BH')
+
+# PARAMETERS
+# 'pageSize' - size of a page in bytes
+# returns the largest min degree 't' for which a full node (2t-1 keys and
+# 2t children) still fits in one page
+def pageDegree(pageSize):
+    t = (pageSize - NODE_HEADER.size + 8) // 32
+    if t < 2:
+        raise ValueError(f"page size {pageSize} is too small to hold a B-tree node")
+    return t
+
+class PagedNode(object):
+    def __init__(self, pageId, leaf=False):
+        self.pageId = pageId # page number of this node in the file
+        self.keys = []
+        self.children = [] # page numbers of the children, not node objects
+        self.leaf = leaf
+
+class Pager(object):
+    def __init__(self, path, pageSize):
+        self.pageSize = pageSize
+        exists = os.path.exists(path) and os.path.getsize(path) > 0
+        self.isNew = not exists # True if the file was missing or empty
+        self.file = open(path, 'r+b' if exists else 'w+b')
+        if not exists:
+            # a new file starts with room for the header page and one node page
+            self.file.truncate(2 * pageSize)
+        self.mm = mmap.mmap(self.file.fileno(), 0)
+
+    def capacity(self):
+        return len(self.mm) // self.pageSize
+
+    # grow the file geometrically so allocating pages stays amortized O(1)
+    def ensureCapacity(self, numPages):
+        if numPages <= self.capacity():
+            return
+        newPages = max(numPages, 2 * self.capacity())
+        self.mm.close()
+        self.file.truncate(newPages * self.pageSize)
+        self.mm = mmap.mmap(self.file.fileno(), 0)
+
+    # byte offset of a page inside the mapping
+    def offset(self, pageId):
+        return pageId * self.pageSize
+
+    def flush(self):
+        self.mm.flush()
+
+    def close(self):
+        self.mm.close()
+        self.file.close()
+
+class BufferPool(object):
+    # PARAMETERS
+    # 'tree' - paged b-tree whose pages are being cached
+    # 'capacity' - maximum number of nodes kept in memory
+    def __init__(self, tree, capacity):
+        # an insert touches at most a parent, the child being split, its new
+        # sibling and a new root, so fewer frames could evict a node in use
+        if capacity < 4:
+            raise ValueError("buffer pool needs at least 4 frames")
+        self.tree = tree
+        self.capacity = capacity
+        self.frames = OrderedDict() # pageId -> node, least recently used first
+        self.dirty = set() # pageIds of nodes changed since they were last written
+
+    def getNode(self, pageId):
+        node = self.frames.get(pageId)
+        if node is not None:
+            self.frames.move_to_end(pageId) # mark as most recently used
+            return node
+        node = self.tree.readNode(pageId)
+        self._admit(node)
+        return node
+
+    # PARAMETERS
+    # 'node' - node that was created or modified and must be written back
+    def markDirty(self, node):
+        if node.pageId in self.frames:
+            self.frames.move_to_end(node.pageId)
+        else:
+            self._admit(node)
+        self.dirty.add(node.pageId)
+
+    def _admit(self, node):
+        # evict least recently used nodes, writing them back if they are dirty
+        while len(self.frames) >= self.capacity:
+            pageId, victim = self.frames.popitem(last=False)
+            if pageId in self.dirty:
+                self.tree.writeNode(victim)
+                self.dirty.discard(pageId)
+        self.frames[node.pageId] = node
+
+    def flush(self):
+        for pageId in self.dirty:
+            self.tree.writeNode(self.frames[pageId])
+        self.dirty.clear()
+
+class PagedBTree(object):
+    # PARAMETERS
+    # 'path' - file backing the tree (created if it doesn't exist or is
+    #   empty; any other file must hold a paged B-tree)
+    # 'pageSize' - bytes per page; the min degree 't' is derived from it
+    # 'poolSize' - number of nodes the buffer pool keeps in memory
+    def __init__(self, path, pageSize=4096, poolSize=64):
+        self.pager = Pager(path, pageSize)
+        isNew = self.pager.isNew
+        if isNew:
+            # start a new tree with an empty leaf as root
+            self.t = pageDegree(pageSize)
+            self.rootId = 1
+            self.numPages = 2
+        else:
+            # reopen an existing tree, leaving the file untouched if it isn't one
+            mm = self.pager.mm
+            header = FILE_HEADER.unpack_from(mm, 0) if len(mm) >= FILE_HEADER.size else None
+            error = None
+            if header is None or header[0] != PAGE_MAGIC:
+                error = f"{path} is not a paged B-tree file"
+            elif header[1] != PAGE_VERSION:
+                error = f"unsupported page file version {header[1]}"
+            elif header[2] != pageSize:
+                error = f"file was written with page size {header[2]}"
+            if error is not None:
+                self.pager.close()
+                raise ValueError(error)
+            self.t, self.rootId, self.numPages = header[3:]
+        self.pageSize = pageSize
+        self.pool = BufferPool(self, poolSize)
+        if isNew:
+            self.pool.markDirty(PagedNode(self.rootId, True))
+            self.flush()
+
+    ''' PAGES '''
+
+    def readNode(self, pageId):
+        mm = self.pager.mm
+        offset = self.pager.offset(pageId)
+        leaf, n = NODE_HEADER.unpack_from(mm, offset)
+        node = PagedNode(pageId, bool(leaf))
+        offset += NODE_HEADER.size
+        node.keys = list(struct.unpack_from(f'<{n}q', mm, offset))
+        if not node.leaf:
+            # children are stored after the room reserved for 2t-1 keys
+            offset += 8 * (2*self.t - 1)
+            node.children = list(struct.unpack_from(f'<{n+1}Q', mm, offset))
+        return node
+
+    def writeNode(self, node):
+        mm = self.pager.mm
+        offset = self.pager.offset(node.pageId)
+        n = len(node.keys)
+        NODE_HEADER.pack_into(mm, offset, node.leaf, n)
+        offset += NODE_HEADER.size
+        struct.pack_into(f'<{n}q', mm, offset, *node.keys)
+        if not node.leaf:
+            offset += 8 * (2*self.t - 1)
+            struct.pack_into(f'<{n+1}Q', mm, offset, *node.children)
+
+    def allocateNode(self, leaf=False):
+        pageId = self.numPages
+        self.numPages += 1
+        self.pager.ensureCapacity(self.numPages)
+        node = PagedNode(pageId, leaf)
+        self.pool.markDirty(node)
+        return node
+
+    # write back all dirty pages and the file header
+    def flush(self):
+        self.pool.flush()
+        FILE_HEADER.pack_into(self.pager.mm, 0, PAGE_MAGIC, PAGE_VERSION,
+                              self.pageSize, self.t, self.rootId, self.numPages)
+        self.pager.flush()
+
+    def close(self):
+        self.flush()
+        self.pool.frames.clear()
+        self.pager.close()
+
+    ''' SEARCHING '''
+
+    # PARAMETERS
+    # 'key' - key to search for
+    # returns (node, index) like BTree.searchBTree, or None
+    def searchBTree(self, key):
+        node = self.pool.getNode(self.rootId)
+        while True:
+            i = bisect_left(node.keys, key)
+            if i < len(node.keys) and key == node.keys[i]:
+                return (node, i)
+            if node.leaf:
+                return None
+            node = self.pool.getNode(node.children[i])
+
+    ''' SPLITTING AND INSERTING NODES '''
+
+    # same as BTree.splitChild, except children are page numbers and every
+    # node that changes is marked dirty in the buffer pool
+    def splitChild(self, x, i):
+        t = self.t
+        y = self.pool.getNode(x.children[i])
+        z = self.allocateNode(y.leaf)
+        x.children.insert(i+1, z.pageId)
+        x.keys.insert(i, y.keys[t-1])
+        z.keys = y.keys[t:]
+        y.keys = y.keys[:t-1]
+        if not y.leaf:
+            z.children = y.children[t:]
+            y.children = y.children[:t]
+        self.pool.markDirty(x)
+        self.pool.markDirty(y)
+        self.pool.markDirty(z)
+
+    # PARAMETERS
+    # 'k' - value to insert (a signed 64-bit integer)
+    def insert(self, k):
+        t = self.t
+        root = self.pool.getNode(self.rootId)
+        if len(root.keys) == (2*t) - 1:
+            newRoot = self.allocateNode()
+            newRoot.children.insert(0, root.pageId)
+            self.rootId = newRoot.pageId
+            self.splitChild(newRoot, 0)
+            self.insertNonFull(newRoot, k)
+        else:
+            self.insertNonFull(root, k)
+
+    def insertNonFull(self, x, k):
+        t = self.t
+        # walk down one page at a time; every node we step into has already
+        # been made non-full, so a split never has to go back up the tree
+        while not x.leaf:
+            i = bisect_right(x.keys, k)
+            child = self.pool.getNode(x.children[i])
+            if len(child.keys) == (2*t) - 1:
+                self.splitChild(x, i)
+                if k > x.keys[i]:
+                    i += 1
+                child = self.pool.getNode(x.children[i])
+            x = child
+        x.keys.insert(bisect_right(x.keys, k), k)
+        self.pool.markDirty(x)
+
+    ''' PRINTING '''
+
+    def _printTree(self, pageId, indent=0):
+        node = self.pool.getNode(pageId)
+        print(' ' * indent, node.keys)
+        if not node.leaf:
+            for child in list(node.children):
+                self._printTree(child, indent + 4)
+
+    def printTree(self):
+        self._printTree(self.rootId)
+
+def getInsertTime(tree, keys):
+    startTime = time.time()
+    for k in keys:
+        tree.insert(k)
+    endTime = time.time()
+    return endTime - startTime
+
+def getLookupTime(tree, keys):
+    startTime = time.time()
+    for k in keys:
+        tree.searchBTree(k)
+    endTime = time.time()
+    return endTime - startTime
+
+# PARAMETERS
+# 'n' - number of random keys to insert and then delete
+# 'batchSize' - number of keys per insertMany/deleteMany call
+def benchmarkBatches(n, batchSize, t=16):
+    keys = list(range(n))
+    random.shuffle(keys)
+    batches = [keys[i:i+batchSize] for i in range(0, n, batchSize)]
+    print(f"Single vs batched operations with {n} random keys (batch size {batchSize}, t = {t}):")
+    print()
+
+    tree = BTree(t)
+    startTime = time.time()
+    for k in keys:
+        tree.insert(k)
+    insertTime = time.time() - startTime
+    startTime = time.time()
+    for k in keys:
+        tree.delete(k)
+    deleteTime = time.time() - startTime
+    print(f"one key at a time: {n / insertTime:10.0f} inserts/sec, {n / deleteTime:10.0f} deletes/sec")
+
+    tree = BTree(t)
+    startTime = time.time()
+    for batch in batches:
+        tree.insertMany(batch)
+    insertTime = time.time() - startTime
+    startTime = time.time()
+    for batch in batches:
+        tree.deleteMany(batch)
+    deleteTime = time.time() - startTime
+    print(f"batched:           {n / insertTime:10.0f} inserts/sec, {n / deleteTime:10.0f} deletes/sec")
+    print()
+
+# PARAMETERS
+# 'n' - number of random keys to insert and then look up
+def benchmark(n):
+    keys = list(range(n))
+    random.shuffle(keys)
+    print(f"Insert and lookup throughput with {n} random keys:")
+    print()
+    for t in (2, 16, 128, 1024):
+        tree = BTree(t)
+        insertTime = getInsertTime(tree, keys)
+        lookupTime = getLookupTime(tree, keys)
+        print(f"t = {t:4}: {n / insertTime:10.0f} inserts/sec, {n / lookupTime:10.0f} lookups/sec")
+    print()
+
 def main():
     # Create tree
     tree = BTree(3)
@@ -164,6 +1440,61 @@ def main():
     tree.insert('F')
     tree.printTree()
     print()
+    print("Tree bulk loaded from sorted keys 'A' to 'Z' (fill = 1.0):")
+    print()
+    bulkTree = BTree.bulkLoad([chr(c) for c in range(ord('A'), ord('Z')+1)], 3)
+    bulkTree.printTree()
+    print()
+    print("B+ tree with keys 1 to 20, range scan from 6 to 13:")
+    print()
+    bPlusTree = BPlusTree(2)
+    for k in range(1, 21):
+        bPlusTree.insert(k, k*k)
+    bPlusTree.printTree()
+    print()
+    print(list(bPlusTree.rangeScan(6, 13)))
+    print()
+    print("Paged B-tree with 2000 keys and a buffer pool of 8 nodes, reopened from disk:")
+    print()
+    with tempfile.TemporaryDirectory() as tempDir:
+        path = os.path.join(tempDir, 'tree.btpg')
+        pagedTree = PagedBTree(path, pageSize=256, poolSize=8)
+        keys = random.sample(range(100000), 2000)
+        for k in keys:
+            pagedTree.insert(k)
+        pages = pagedTree.numPages - 1
+        pagedTree.close()
+        pagedTree = PagedBTree(path, pageSize=256, poolSize=8)
+        found = sum(pagedTree.searchBTree(k) is not None for k in keys)
+        print(f"{pages} node pages on disk, {found} of {len(keys)} keys found after reopening")
+        print(f"search for a missing key: {pagedTree.searchBTree(-1)}")
+        pagedTree.close()
+    print()
+    benchmark(100000)
+    benchmarkBatches(100000, 100)
+    benchmarkBatches(100000, 5000)
+    print("ConcurrentBTree stress test (2 writers inserting 20000 keys each),")
+    print("against a BTree behind one global lock:")
+    print()
+    for readers in (1, 2, 4, 8):
+        print(f"{readers} reader threads:")
+        lookupRate, perThread, insertRate = stressConcurrentBTree(readers, 2, 20000)
+        print(f"    ConcurrentBTree: {lookupRate:10.0f} lookups/sec, {perThread:10.0f} per thread,"
+              f" {insertRate:10.0f} inserts/sec")
+        lookupRate, perThread, insertRate = stressConcurrentBTree(readers, 2, 20000, treeType=LockedBTree)
+        print(f"    global lock:     {lookupRate:10.0f} lookups/sec, {perThread:10.0f} per thread,"
+              f" {insertRate:10.0f} inserts/sec")
+    print()
+    print("ConcurrentBTree read scaling (100000 keys, readers only):")
+    print()
+    lookupRate, _ = getReadScaling(0, 100000)
+    print(f"plain BTree, 1 thread: {lookupRate:10.0f} lookups/sec (ceiling under the GIL)")
+    for readers in (1, 2, 4, 8):
+        lookupRate, perThread = getReadScaling(readers, 100000)
+        lockedRate, _ = getReadScaling(readers, 100000, treeType=LockedBTree)
+        print(f"{readers} reader threads:     {lookupRate:10.0f} lookups/sec, {perThread:10.0f} per thread"
+              f" (global lock: {lockedRate:10.0f} lookups/sec)")
+    print()
     
 if __name__ == '__main__':
     main()
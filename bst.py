@@ -1,5 +1,11 @@
 # Binary Search Tree Implementation and Methods
 
+import math
+import struct
+import sys
+from array import array
+from collections import namedtuple
+
 class Node(object):
     
     def __init__(self, value):
@@ -47,17 +53,249 @@ class Node(object):
         
         return True
 
+# Snapshot file layout (all integers little-endian):
+#   header - magic, format version, number of nodes n
+#   values - the n values in preorder, as signed 64-bit integers
+#   flags  - one byte per node in the same order: left child present,
+#            right child present
+SNAPSHOT_MAGIC = b'BSTS'
+SNAPSHOT_VERSION = 1
+SNAPSHOT_HEADER = struct.Struct('<4sHQ')
+SNAPSHOT_LEFT = 1
+SNAPSHOT_RIGHT = 2
+
 class BinaryTree(object):
-    def __init__(self, root):
-        self.root = Node(root)
-        
+    # PARAMETERS
+    # 'root' - value of the root node (None for an empty tree)
+    # 'alpha' - turns on scapegoat rebalancing when given (0.5 < alpha < 1).
+    # After an insert that lands deeper than log base 1/alpha of the size,
+    # the lowest ancestor with a child holding more than alpha of its nodes
+    # is rebuilt into a perfectly balanced subtree. Smaller alpha keeps the
+    # tree flatter at the cost of more frequent rebuilds.
+    def __init__(self, root, alpha=None):
+        if alpha is not None and not 0.5 < alpha < 1:
+            raise ValueError("alpha must be between 0.5 and 1")
+        self.root = Node(root) if root is not None else None
+        self.alpha = alpha
+        self.size = 0 if root is None else 1
+        self.maxSize = self.size # largest size since the last full rebuild
+
+    ''' INSERTING '''
+
+    # Walks down with a loop instead of recursing, so the depth of the tree
+    # is not limited by the recursion limit. Values already in the tree are
+    # ignored.
     def insert(self, value):
-        self.root.insert(value)
+        if self.root is None:
+            self.root = Node(value)
+            self.size = self.maxSize = 1
+            return
+        path = [] # nodes from the root down to the new node's parent
+        x = self.root
+        while x is not None:
+            path.append(x)
+            if value < x.value:
+                x = x.left
+            elif value > x.value:
+                x = x.right
+            else:
+                return
+        z = Node(value)
+        if value < path[-1].value:
+            path[-1].left = z
+        else:
+            path[-1].right = z
+        self.size += 1
+        self.maxSize = max(self.maxSize, self.size)
+        if self.alpha is not None and len(path) > math.log(self.size, 1 / self.alpha):
+            self._rebuildScapegoat(path, z)
+
+    # PARAMETERS
+    # 'path' - nodes from the root down to the parent of 'z'
+    # 'z' - the node that was just inserted too deep
+    def _rebuildScapegoat(self, path, z):
+        child = z
+        childSize = 1
+        for i in range(len(path) - 1, -1, -1):
+            x = path[i]
+            sibling = x.right if child is x.left else x.left
+            size = 1 + childSize + self._subtreeSize(sibling)
+            if childSize > self.alpha * size:
+                subtree = self._rebuild(x)
+                if i == 0:
+                    self.root = subtree
+                elif path[i - 1].left is x:
+                    path[i - 1].left = subtree
+                else:
+                    path[i - 1].right = subtree
+                return
+            child = x
+            childSize = size
+
+    ''' SEARCHING '''
+
+    # returns the node holding 'value', or None if it isn't in the tree
+    def search(self, value):
+        x = self.root
+        while x is not None and x.value != value:
+            x = x.left if value < x.value else x.right
+        return x
+
+    ''' DELETING '''
+
+    # returns True if 'value' was found and removed
+    def delete(self, value):
+        parent = None
+        x = self.root
+        while x is not None and x.value != value:
+            parent = x
+            x = x.left if value < x.value else x.right
+        if x is None:
+            return False
+        if x.left is not None and x.right is not None:
+            # take over the successor's value and unlink the successor,
+            # which has no left child
+            parent = x
+            s = x.right
+            while s.left is not None:
+                parent = s
+                s = s.left
+            x.value = s.value
+            x = s
+        child = x.left if x.left is not None else x.right
+        if parent is None:
+            self.root = child
+        elif parent.left is x:
+            parent.left = child
+        else:
+            parent.right = child
+        self.size -= 1
+        # scapegoat trees rebuild everything once enough nodes are gone
+        if self.alpha is not None and self.size < self.alpha * self.maxSize:
+            self.root = self._rebuild(self.root)
+            self.maxSize = self.size
+        return True
+
+    ''' REBUILDING '''
+
+    # counts the nodes under 'node' with an explicit stack
+    def _subtreeSize(self, node):
+        count = 0
+        stack = [node] if node is not None else []
+        while stack:
+            x = stack.pop()
+            count += 1
+            if x.left is not None:
+                stack.append(x.left)
+            if x.right is not None:
+                stack.append(x.right)
+        return count
+
+    # relinks the nodes under 'node' into a perfectly balanced subtree in
+    # linear time and returns its root
+    def _rebuild(self, node):
+        nodes = []
+        stack = []
+        x = node
+        while stack or x is not None:
+            while x is not None:
+                stack.append(x)
+                x = x.left
+            x = stack.pop()
+            nodes.append(x)
+            x = x.right
+        return self._buildBalanced(nodes, 0, len(nodes) - 1)
+
+    # recursion depth is only log2 of the number of nodes here
+    def _buildBalanced(self, nodes, lo, hi):
+        if lo > hi:
+            return None
+        mid = (lo + hi) // 2
+        x = nodes[mid]
+        x.left = self._buildBalanced(nodes, lo, mid - 1)
+        x.right = self._buildBalanced(nodes, mid + 1, hi)
+        return x
+
+    # number of levels in the tree
+    def height(self):
+        h = 0
+        level = [self.root] if self.root is not None else []
+        while level:
+            h += 1
+            level = [c for x in level for c in (x.left, x.right) if c is not None]
+        return h
     
+    ''' SNAPSHOTS '''
+
+    # Writes the tree to 'path' in the snapshot format described above
+    def saveSnapshot(self, path):
+        values = array('q')
+        flags = array('B')
+        stack = [self.root] if self.root is not None else []
+        while stack:
+            x = stack.pop()
+            values.append(x.value)
+            flag = 0
+            if x.right is not None:
+                flag |= SNAPSHOT_RIGHT
+                stack.append(x.right)
+            if x.left is not None:
+                flag |= SNAPSHOT_LEFT
+                stack.append(x.left)
+            flags.append(flag)
+        if sys.byteorder == 'big':
+            values.byteswap()
+        with open(path, 'wb') as f:
+            f.write(SNAPSHOT_HEADER.pack(SNAPSHOT_MAGIC, SNAPSHOT_VERSION, len(values)))
+            values.tofile(f)
+            flags.tofile(f)
+
+    # PARAMETERS
+    # 'path' - file written by saveSnapshot
+    # 'alpha' - as in __init__
+    # returns the tree, rebuilt in one pass over the file with the shape it
+    # was saved with (no comparisons are made)
+    @classmethod
+    def loadSnapshot(cls, path, alpha=None):
+        with open(path, 'rb') as f:
+            header = f.read(SNAPSHOT_HEADER.size)
+            if len(header) == SNAPSHOT_HEADER.size:
+                magic, version, n = SNAPSHOT_HEADER.unpack(header)
+            if len(header) < SNAPSHOT_HEADER.size or magic != SNAPSHOT_MAGIC or version != SNAPSHOT_VERSION:
+                raise ValueError(f"{path} is not a binary tree snapshot")
+            # the arrays are filled straight from the file
+            values = array('q')
+            flags = array('B')
+            try:
+                values.fromfile(f, n)
+                flags.fromfile(f, n)
+            except (EOFError, ValueError): # ValueError if it ends mid-item
+                raise ValueError(f"{path} is truncated")
+        if sys.byteorder == 'big':
+            values.byteswap()
+        tree = cls(None, alpha)
+        # (parent, flag for the side) of every child link still to be filled
+        # in; in preorder the next node always goes into the last one
+        slots = []
+        for value, flag in zip(values, flags):
+            x = Node(value)
+            if slots:
+                parent, side = slots.pop()
+                if side == SNAPSHOT_LEFT:
+                    parent.left = x
+                else:
+                    parent.right = x
+            else:
+                tree.root = x
+            if flag & SNAPSHOT_RIGHT:
+                slots.append((x, SNAPSHOT_RIGHT))
+            if flag & SNAPSHOT_LEFT:
+                slots.append((x, SNAPSHOT_LEFT))
+        tree.size = tree.maxSize = n
+        return tree
+
     def checkBST(self):
-        if self.root is None:
-            return True
-        return self.root.isBST()
+        return not validateTree(self)
     
     # Print from right, to root, to left
     def _printTree(self, node, level):
@@ -71,6 +309,87 @@ class BinaryTree(object):
     def printTree(self):
         self._printTree(self.root, 0)
     
+# Tree validation
+# validateTree checks the whole tree in one pass over an explicit stack, so
+# it works on trees of any depth. Every node is checked against the range of
+# values its ancestors allow, not just against its own children, and every
+# problem found is returned instead of printed.
+#
+# It also accepts a RedBlackTree from rb_trees.py (anything with a 'nil'
+# sentinel and nodes with key/color/p), in which case the same pass checks
+# the red black properties and the parent pointers. Black is taken to be
+# the color of nil.
+#
+# BinaryTree never stores a value twice, so there every value has to be
+# strictly inside the range its ancestors allow. RedBlackTree does keep
+# duplicates (an equal key goes right, and rotations can move it to the
+# left), so there keys equal to an ancestor's are allowed.
+# Black-heights are worked out in post-order during the same pass: a node
+# is looked at again once both of its subtrees are done, so one whose two
+# subtrees have different black-heights is reported once, at that node,
+# rather than once for every path below it. Only the heights of subtrees
+# whose parent is still on the stack are kept.
+
+Violation = namedtuple('Violation', ['kind', 'value', 'message'])
+
+# PARAMETERS
+# 'tree' - a BinaryTree or a RedBlackTree
+# returns a list of Violations (empty if the tree is valid). Their kinds are
+# 'order', 'parent', 'red-root', 'red-red' and 'black-height'
+def validateTree(tree):
+    violations = []
+    nil = getattr(tree, 'nil', None)
+    redBlack = nil is not None
+    if redBlack:
+        black = nil.color
+        keyOf = lambda x: x.key
+    else:
+        keyOf = lambda x: x.value
+    root = tree.root
+    if root is None or root is nil:
+        return violations
+    if redBlack and root.color != black:
+        violations.append(Violation('red-root', root.key, "the root is red"))
+    # black nodes on the paths from the root of each finished subtree down
+    # to nil (not counting nil), for subtrees whose parent isn't finished
+    heights = []
+
+    # entries: (node, lower bound, upper bound, whether its subtrees are done)
+    stack = [(root, None, None, False)]
+    while stack:
+        x, lo, hi, done = stack.pop()
+        if done:
+            # the left subtree finished first, so the right one's height is on top
+            right = heights.pop() if x.right is not nil else 0
+            left = heights.pop() if x.left is not nil else 0
+            if left != right:
+                violations.append(Violation('black-height', x.key,
+                    f"paths down the left of {x.key} have {left} black nodes, but down the right {right}"))
+            heights.append(max(left, right) + (1 if x.color == black else 0))
+            continue
+        key = keyOf(x)
+        if redBlack:
+            outside = (lo is not None and key < lo) or (hi is not None and key > hi)
+        else:
+            outside = (lo is not None and key <= lo) or (hi is not None and key >= hi)
+        if outside:
+            violations.append(Violation('order', key,
+                f"{key} is outside the range ({lo}, {hi}) set by its ancestors"))
+        if redBlack:
+            stack.append((x, lo, hi, True)) # comes back to x after its subtrees
+        for child, childLo, childHi in ((x.right, key, hi), (x.left, lo, key)):
+            if child is None or child is nil:
+                continue
+            if redBlack:
+                if child.p is not x:
+                    violations.append(Violation('parent', child.key,
+                        f"the parent pointer of {child.key} does not point to {key}"))
+                if x.color != black and child.color != black:
+                    violations.append(Violation('red-red', child.key,
+                        f"red node {child.key} has a red parent {key}"))
+            stack.append((child, childLo, childHi, False))
+    return violations
+
 def main():
     
     # Create Example 1 Tree (see beginning of file)
@@ -109,6 +428,8 @@ def main():
     print("==== Example 2 Tree ====")
     print()
     print("Checking for BST validity...")
+    for violation in validateTree(bt2):
+        print(f"Error found where value = {violation.value}: {violation.message}.")
     print(f"Validity check output: {bt2.checkBST()}")
     print()
     print("Tree structure:")
@@ -116,6 +437,20 @@ def main():
     bt2.printTree()
     print()
 
+    print("==== Sorted inserts ====")
+    print()
+    plain = BinaryTree(1)
+    balanced = BinaryTree(1, alpha=0.7)
+    for value in range(2, 2001):
+        plain.insert(value)
+        balanced.insert(value)
+    print(f"Height after inserting 1..2000 in order: {plain.height()}")
+    print(f"Same with scapegoat rebalancing (alpha = 0.7): {balanced.height()}")
+    balanced.delete(1000)
+    print(f"Found 1000 after deleting it: {balanced.search(1000) is not None}")
+    print(f"Errors found in the unbalanced tree: {len(validateTree(plain))}")
+    print()
+
 if __name__ == '__main__':
     main()
 
@@ -1,14 +1,181 @@
 # Hash Tables and Collision Resolution Techniques
 
+import csv
+import io
+import json
 import random
+import time
+from collections import Counter
+
+try:
+    import numpy as np
+except ImportError: # only needed for BatchHashTable
+    np = None
 
 TABLE_SIZE = 1001
 
+# Instrumentation
+# A HashTableStats object can be passed to a HashTable (or a
+# RobinHoodHashTable) to record how many slots every insert and lookup
+# probes, and how full the table is as it fills up. Tables only check
+# whether they have a stats object, so leaving it out costs next to
+# nothing. One stats object can be shared by several tables, since every
+# record is kept per probing method, which makes it easy to compare
+# methods on the same keys. Cluster sizes (runs of used slots) are taken
+# from a table on request with recordClusters.
+
+class HashTableStats(object):
+    # PARAMETERS
+    # 'sampleEvery' - record the load factor after every this many inserts
+    #   of each method
+    def __init__(self, sampleEvery=100):
+        self.sampleEvery = sampleEvery
+        self.probes = {} # (operation, method) -> Counter of probe lengths
+        self.inserts = Counter() # inserts seen so far, per method
+        self.loads = [] # (method, inserts so far, load factor) samples
+        self.clusters = {} # method -> Counter of cluster sizes
+
+    # PARAMETERS
+    # 'operation' - "insert", "failed insert", "hit" or "miss"
+    # 'method' - probing method of the table
+    # 'probes' - number of slots the operation looked at
+    def record(self, operation, method, probes):
+        key = (operation, method)
+        histogram = self.probes.get(key)
+        if histogram is None:
+            histogram = self.probes[key] = Counter()
+        histogram[probes] += 1
+
+    # like record, for a batch of operations of the same kind: 'probes' is a
+    # sequence with the probe length of each
+    def recordMany(self, operation, method, probes):
+        if len(probes):
+            self.probes.setdefault((operation, method), Counter()).update(probes)
+
+    def recordInsert(self, hashTable, method, probes, inserted):
+        self.record("insert" if inserted else "failed insert", method, probes)
+        self.inserts[method] += 1
+        if self.inserts[method] % self.sampleEvery == 0:
+            self.loads.append((method, self.inserts[method], hashTable.count / hashTable.size))
+
+    # like recordInsert for a batch: 'probes' holds the probe length of every
+    # value that was inserted, and 'failures' counts those that weren't (each
+    # of them probed the whole table). The load factor is sampled once, after
+    # the batch, if the batch passed a sampling point
+    def recordInsertBatch(self, hashTable, method, probes, failures=0):
+        self.recordMany("insert", method, probes)
+        if failures:
+            self.recordMany("failed insert", method, [hashTable.size] * failures)
+        before = self.inserts[method]
+        self.inserts[method] += len(probes) + failures
+        if self.inserts[method] // self.sampleEvery > before // self.sampleEvery:
+            self.loads.append((method, self.inserts[method], hashTable.count / hashTable.size))
+
+    # adds the current cluster sizes of 'hashTable' to those of 'method'
+    def recordClusters(self, hashTable, method):
+        self.clusters.setdefault(method, Counter()).update(clusterSizes(hashTable.table))
+
+    ''' REPORTING '''
+
+    # returns one dict per (operation, method) with the number of
+    # operations and the mean, median, 99th percentile and longest probe
+    # length
+    def summary(self):
+        rows = []
+        for (operation, method), histogram in sorted(self.probes.items()):
+            count = sum(histogram.values())
+            lengths = sorted(histogram)
+            # probe length at or below which a fraction p of the operations fall
+            def percentile(p):
+                seen = 0
+                for length in lengths:
+                    seen += histogram[length]
+                    if seen >= p * count:
+                        return length
+            rows.append({
+                "operation": operation,
+                "method": method,
+                "count": count,
+                "mean": sum(length * n for length, n in histogram.items()) / count,
+                "p50": percentile(0.5),
+                "p99": percentile(0.99),
+                "max": lengths[-1],
+            })
+        return rows
+
+    # returns everything recorded as a JSON string, also written to 'path'
+    # if one is given
+    def toJSON(self, path=None):
+        data = {
+            "summary": self.summary(),
+            "probes": [{"operation": operation, "method": method, "histogram": dict(sorted(histogram.items()))}
+                       for (operation, method), histogram in sorted(self.probes.items())],
+            "loads": [{"method": method, "inserts": inserts, "load": load}
+                      for method, inserts, load in self.loads],
+            "clusters": {method: dict(sorted(sizes.items())) for method, sizes in sorted(self.clusters.items())},
+        }
+        text = json.dumps(data, indent=2)
+        if path is not None:
+            with open(path, "w") as f:
+                f.write(text)
+        return text
+
+    # returns everything recorded as CSV with the columns
+    #   kind,method,operation,key,value
+    # where 'kind' is "probes" (key is a probe length, value the number of
+    # operations), "clusters" (key is a cluster size, value the number of
+    # clusters) or "load" (key is the number of inserts, value the load
+    # factor). Also written to 'path' if one is given
+    def toCSV(self, path=None):
+        out = io.StringIO()
+        writer = csv.writer(out, lineterminator="\n")
+        writer.writerow(["kind", "method", "operation", "key", "value"])
+        for (operation, method), histogram in sorted(self.probes.items()):
+            for length in sorted(histogram):
+                writer.writerow(["probes", method, operation, length, histogram[length]])
+        for method, sizes in sorted(self.clusters.items()):
+            for size in sorted(sizes):
+                writer.writerow(["clusters", method, "", size, sizes[size]])
+        for method, inserts, load in self.loads:
+            writer.writerow(["load", method, "", inserts, load])
+        text = out.getvalue()
+        if path is not None:
+            with open(path, "w", newline="") as f:
+                f.write(text)
+        return text
+
+# returns a Counter of the lengths of the runs of used slots in 'table'.
+# A run that wraps around the end of the table counts as one cluster
+def clusterSizes(table):
+    sizes = Counter()
+    n = len(table)
+    # start right after an empty slot so no run is cut in two
+    start = next((j + 1 for j in range(n) if table[j] is None), None)
+    if start is None:
+        if n:
+            sizes[n] += 1
+        return sizes
+    run = 0
+    for k in range(n):
+        if table[(start + k) % n] is not None:
+            run += 1
+        elif run:
+            sizes[run] += 1
+            run = 0
+    if run:
+        sizes[run] += 1
+    return sizes
+
 class HashTable(object):
     
-    def __init__(self, size):
+    # PARAMETERS
+    # 'size' - number of slots
+    # 'stats' - optional HashTableStats that records every insert and search
+    def __init__(self, size, stats=None):
         self.size = size
         self.table = [None]*size
+        self.count = 0 # values stored
+        self.stats = stats
         
     def h1(self, x):
         return x % self.size # mod by self.size to ensure wrapping
@@ -22,9 +189,6 @@ class HashTable(object):
     def linearProbe(self, x, i):
         return (self.h1(x) + i) % self.size
     
-    def linearProbe(self, j):             
-        return (j + 1) % self.size
-    
     def quadraticProbe(self, x, i):
         return (self.h1(x) + (i*i)) % self.size
     
@@ -46,13 +210,773 @@ class HashTable(object):
             else:
                 j = self.linearProbe(x, i)
         # x can't be inserted (table is full or infinite loop occurred)
-        if self.table[j] is not None:
+        inserted = self.table[j] is None
+        if not inserted:
             print(f"{x} could not be inserted")
         else:
             # put x in slot
             self.table[j] = x
+            self.count += 1
+        if self.stats is not None:
+            self.stats.recordInsert(self, method, collisions + 1, inserted)
+        return collisions
+
+    # PARAMETERS
+    # 'x' - value to look for
+    # 'method' - probing method the value was inserted with
+    # returns the slot holding x, or None. A miss has to probe until it
+    # reaches an empty slot
+    def search(self, x, method="linear"):
+        i = 0
+        j = self.h1(x)
+        while self.table[j] is not None and i < self.size:
+            if self.table[j] == x:
+                if self.stats is not None:
+                    self.stats.record("hit", method, i + 1)
+                return j
+            i += 1
+            if method == "quadratic":
+                j = self.quadraticProbe(x, i)
+            elif method == "double hash":
+                j = self.doubleHashProbe(x, i)
+            else:
+                j = self.linearProbe(x, i)
+        if self.stats is not None:
+            self.stats.record("miss", method, min(i + 1, self.size))
+        return None
+
+# Robin Hood hashing: linear probing where every slot also records how far
+# its value is from its home slot (h1). An inserted value that has probed
+# further than the value sitting in a slot takes that slot, and the
+# displaced value carries on probing instead. This evens out the probe
+# lengths, and since the distances along a run never jump by more than one,
+# a lookup can stop as soon as it meets a value closer to home than itself.
+# Deletion shifts the following values back by one slot instead of leaving
+# a tombstone.
+
+class RobinHoodHashTable(HashTable):
+
+    def __init__(self, size, stats=None):
+        super().__init__(size, stats)
+        self.dist = [0]*size # probe distance of the value in each slot
+
+    # 'method' is accepted for compatibility with HashTable.insert, but
+    # Robin Hood hashing always probes linearly
+    # returns the number of collisions, as HashTable.insert does
+    def insert(self, x, method="robin hood"):
+        if self.count == self.size:
+            print(f"{x} could not be inserted")
+            if self.stats is not None:
+                self.stats.recordInsert(self, method, self.size, False)
+            return 0
+        table, dist = self.table, self.dist
+        collisions = 0
+        d = 0
+        j = self.h1(x)
+        while table[j] is not None:
+            if dist[j] < d:
+                # the value here is better off than x: x takes its place
+                table[j], x = x, table[j]
+                dist[j], d = d, dist[j]
+            collisions += 1
+            d += 1
+            j = (j + 1) % self.size
+        table[j] = x
+        dist[j] = d
+        self.count += 1
+        if self.stats is not None:
+            self.stats.recordInsert(self, method, collisions + 1, True)
+        return collisions
+
+    # returns the slot holding x, or None
+    def search(self, x, method="robin hood"):
+        table, dist = self.table, self.dist
+        d = 0
+        j = self.h1(x)
+        while table[j] is not None and dist[j] >= d:
+            if table[j] == x:
+                if self.stats is not None:
+                    self.stats.record("hit", method, d + 1)
+                return j
+            d += 1
+            j = (j + 1) % self.size
+        if self.stats is not None:
+            self.stats.record("miss", method, d + 1)
+        return None
+
+    # returns True if x was found and removed
+    def delete(self, x):
+        j = self.search(x)
+        if j is None:
+            return False
+        table, dist = self.table, self.dist
+        # shift the rest of the run back until a value that is already home
+        k = (j + 1) % self.size
+        while table[k] is not None and dist[k] > 0:
+            table[j] = table[k]
+            dist[j] = dist[k] - 1
+            j = k
+            k = (k + 1) % self.size
+        table[j] = None
+        dist[j] = 0
+        self.count -= 1
+        return True
+
+# Cuckoo hashing
+# Every value has one candidate bucket for each of 'hashes' hash functions
+# and is always stored in one of them, so a lookup never looks at more than
+# hashes * bucketSize slots, however full the table gets. An insert that
+# finds all of its buckets full evicts a value from one of them, which then
+# moves to one of its own other buckets, possibly evicting another value,
+# and so on. If that chain gets longer than 'maxKicks', the table picks new
+# hash functions and rebuilds itself, doubling the number of buckets if the
+# rebuild keeps failing. It also doubles whenever an insert would take it
+# past 'maxLoad'.
+#
+# The hash functions are hash((seed, x)) mod buckets, with random seeds
+# picked every time the table is rebuilt.
+
+REHASH_TRIES = 4 # rebuilds at the same size before the table grows
+
+class CuckooHashTable(object):
+    # PARAMETERS
+    # 'size' - initial number of slots (rounded up to whole buckets)
+    # 'hashes' - number of hash functions (at least 2)
+    # 'bucketSize' - slots per bucket
+    # 'maxKicks' - longest eviction chain before the table is rebuilt
+    # 'maxLoad' - fraction of used slots past which the table grows. Two
+    #   hash functions reach about 0.5 with single slot buckets, and about
+    #   0.95 with buckets of 4
+    # 'stats' - optional HashTableStats, as for HashTable
+    def __init__(self, size, hashes=2, bucketSize=4, maxKicks=500, maxLoad=0.9, stats=None):
+        if hashes < 2:
+            raise ValueError("cuckoo hashing needs at least 2 hash functions")
+        if bucketSize < 1:
+            raise ValueError("bucketSize must be at least 1")
+        if not 0 < maxLoad < 1:
+            raise ValueError("maxLoad must be between 0 and 1")
+        self.hashes = hashes
+        self.bucketSize = bucketSize
+        self.maxKicks = maxKicks
+        self.maxLoad = maxLoad
+        self.stats = stats
+        self.count = 0 # values stored
+        self.rebuilds = 0 # times the table was rebuilt (with or without growing)
+        self._allocate(max(1, -(-size // bucketSize)))
+
+    # empties the table, resizes it to 'buckets' buckets and picks new hash
+    # functions
+    def _allocate(self, buckets):
+        self.buckets = buckets
+        self.size = buckets * self.bucketSize
+        self.table = [None]*self.size
+        self.seeds = [random.getrandbits(64) for _ in range(self.hashes)]
+
+    # returns the first slot of every bucket x may be stored in
+    def _buckets(self, x):
+        return [hash((seed, x)) % self.buckets * self.bucketSize for seed in self.seeds]
+
+    # returns (slot holding x or None, number of slots looked at)
+    def _find(self, x):
+        table, buckets, bucketSize = self.table, self.buckets, self.bucketSize
+        probes = 0
+        for seed in self.seeds:
+            start = hash((seed, x)) % buckets * bucketSize
+            bucket = table[start:start + bucketSize]
+            if x in bucket:
+                i = bucket.index(x)
+                return start + i, probes + i + 1
+            probes += bucketSize
+        return None, probes
+
+    # puts x into a free slot of one of its buckets, evicting values along
+    # the way if it has to
+    # returns (number of evictions, value left without a slot or None)
+    def _place(self, x):
+        table = self.table
+        previous = None
+        for kicks in range(self.maxKicks + 1):
+            starts = self._buckets(x)
+            for start in starts:
+                for j in range(start, start + self.bucketSize):
+                    if table[j] is None:
+                        table[j] = x
+                        return kicks, None
+            if kicks == self.maxKicks:
+                break
+            # don't send x straight back to the bucket it was just evicted from
+            choices = [start for start in starts if start != previous] or starts
+            previous = random.choice(choices)
+            j = previous + random.randrange(self.bucketSize)
+            table[j], x = x, table[j]
+        return self.maxKicks, x
+
+    # moves every value, and 'extra' if given, into a table of 'buckets'
+    # buckets with new hash functions
+    def _rebuild(self, buckets, extra=None):
+        values = [x for x in self.table if x is not None]
+        if extra is not None:
+            values.append(extra)
+        self.rebuilds += 1
+        tries = 0
+        while True:
+            self._allocate(buckets)
+            if all(self._place(x)[1] is None for x in values):
+                return
+            tries += 1
+            if tries == REHASH_TRIES:
+                buckets *= 2
+                tries = 0
+                # only possible if more values share a hash than fit in
+                # their buckets
+                if buckets * self.bucketSize > 16 * len(values) + 1024:
+                    raise RuntimeError("values could not be placed, too many share a hash")
+
+    # 'method' is accepted for compatibility with HashTable.insert
+    # returns the number of values evicted to make room for x
+    def insert(self, x, method="cuckoo"):
+        if self._find(x)[0] is not None:
+            return 0
+        if self.count + 1 > self.maxLoad * self.size:
+            self._rebuild(self.buckets * 2)
+        kicks, homeless = self._place(x)
+        if homeless is not None:
+            self._rebuild(self.buckets, homeless)
+        self.count += 1
+        if self.stats is not None:
+            self.stats.recordInsert(self, "cuckoo", kicks + 1, True)
+        return kicks
+
+    # returns the slot holding x, or None
+    def search(self, x, method="cuckoo"):
+        j, probes = self._find(x)
+        if self.stats is not None:
+            self.stats.record("miss" if j is None else "hit", "cuckoo", probes)
+        return j
+
+    # returns True if x was found and removed
+    def delete(self, x):
+        j = self._find(x)[0]
+        if j is None:
+            return False
+        self.table[j] = None
+        self.count -= 1
+        return True
+
+# Batch operations with NumPy
+# BatchHashTable keeps the same open addressing scheme as HashTable, but the
+# table lives in NumPy arrays (the keys, and a flag for every used slot), so
+# that a whole batch of integer keys can be hashed and probed at once.
+#
+# insertBatch gives exactly the layout that inserting the keys one by one
+# with HashTable.insert would. It works in rounds: every key that isn't
+# placed yet proposes the next slot of its probe sequence, and each slot
+# goes to the earliest key (in batch order) that has proposed it so far,
+# found with np.minimum.at. A key that loses, or is later evicted by an
+# earlier key, moves on to its next slot in the following round. Keys
+# already in the table count as earlier than the whole batch, so they are
+# never evicted. Once no key moves, every key sits in the first slot of its
+# sequence that no earlier key holds, which is the sequential result.
+#
+# The rounds are what keep this from being much faster than inserting one
+# key at a time: keys in long clusters need one round per slot they probe,
+# and every round gathers and scatters at random positions in the table.
+# Measured on 200000 keys at 70% load, insertBatch is about 3x faster than
+# HashTable.insert with linear probing and about 4x with double hashing,
+# while getBatch is 6-9x faster than HashTable.search.
+#
+# self.table is a view of the arrays that reads and writes like
+# HashTable.table (a key, or None for a free slot), so code written for a
+# HashTable's slots, such as clusterSizes, works on a BatchHashTable too.
+
+# list-like view of the slots of a BatchHashTable
+class _BatchSlots(object):
+    def __init__(self, keys, used):
+        self.keys = keys
+        self.used = used
+
+    def __len__(self):
+        return len(self.keys)
+
+    def __getitem__(self, j):
+        return int(self.keys[j]) if self.used[j] else None
+
+    def __setitem__(self, j, x):
+        if x is None:
+            self.used[j] = False
+        else:
+            self.keys[j] = x
+            self.used[j] = True
+
+    def __iter__(self):
+        for key, used in zip(self.keys.tolist(), self.used.tolist()):
+            yield key if used else None
+
+class BatchHashTable(HashTable):
+
+    def __init__(self, size, stats=None):
+        if np is None:
+            raise ImportError("BatchHashTable needs NumPy")
+        super().__init__(size, stats)
+        self.keys = np.zeros(size, dtype=np.int64)
+        self.used = np.zeros(size, dtype=bool)
+        self.table = _BatchSlots(self.keys, self.used)
+
+    # slots visited at step 'i' of the probe sequences of 'x' (arrays)
+    def _probeBatch(self, x, i, method):
+        home = x % self.size
+        if method == "quadratic":
+            return (home + i * i) % self.size
+        if method == "double hash":
+            return (home + i * (7 - x % 7)) % self.size
+        return (home + i) % self.size
+
+    # PARAMETERS
+    # 'keys' - integer keys to insert, in the order they would be inserted
+    # 'method' - "linear", "quadratic" or "double hash"
+    # returns the total number of collisions, as the sum of what
+    # HashTable.insert would have returned for each key
+    def insertBatch(self, keys, method="linear"):
+        keys = np.asarray(keys, dtype=np.int64)
+        n = len(keys)
+        size = self.size
+        # batch index of the key holding each slot: -1 for keys that were
+        # there before the batch, n for free slots
+        owner = np.where(self.used, -1, n)
+        step = np.zeros(n, dtype=np.int64)
+        active = np.arange(n)
+        failed = []
+        while active.size:
+            slots = self._probeBatch(keys[active], step[active], method)
+            before = owner[slots]
+            np.minimum.at(owner, slots, active)
+            after = owner[slots]
+            # proposers that didn't get their slot try the next one
+            losers = active[after != active]
+            # keys that held a slot someone earlier has now taken
+            evicted = before[(before >= 0) & (before < n) & (before != after)]
+            evicted = np.unique(evicted)
+            active = np.concatenate((losers, evicted))
+            step[active] += 1
+            # a key that has tried every step of its sequence is dropped,
+            # as HashTable.insert gives up after size - 1 collisions
+            exhausted = step[active] >= size
+            if exhausted.any():
+                failed.append(active[exhausted])
+                active = active[~exhausted]
+        placed = (owner >= 0) & (owner < n)
+        self.keys[placed] = keys[owner[placed]]
+        self.used |= placed
+        self.count += int(placed.sum())
+        collisions = int(step[owner[placed]].sum())
+        failures = 0
+        for missing in failed:
+            for key in keys[missing]:
+                print(f"{key} could not be inserted")
+            collisions += len(missing) * (size - 1)
+            failures += len(missing)
+        if self.stats is not None:
+            self.stats.recordInsertBatch(self, method, (step[owner[placed]] + 1).tolist(), failures)
         return collisions
 
+    # PARAMETERS
+    # 'keys' - integer keys to look up
+    # 'method' - probing method the keys were inserted with
+    # returns an array with the slot of each key, or -1 where it is missing
+    def getBatch(self, keys, method="linear"):
+        keys = np.asarray(keys, dtype=np.int64)
+        result = np.full(len(keys), -1, dtype=np.int64)
+        # slots looked at by each key, only counted for the stats
+        probes = np.zeros(len(keys), dtype=np.int64) if self.stats is not None else None
+        active = np.arange(len(keys))
+        for i in range(self.size):
+            if not active.size:
+                break
+            if probes is not None:
+                probes[active] = i + 1
+            slots = self._probeBatch(keys[active], i, method)
+            used = self.used[slots]
+            hit = used & (self.keys[slots] == keys[active])
+            result[active[hit]] = slots[hit]
+            # keys stop at a hit or at an empty slot
+            active = active[used & ~hit]
+        if probes is not None:
+            found = result >= 0
+            self.stats.recordMany("hit", method, probes[found].tolist())
+            self.stats.recordMany("miss", method, probes[~found].tolist())
+        return result
+
+    # returns a boolean array telling which of 'keys' are in the table
+    def containsBatch(self, keys, method="linear"):
+        return self.getBatch(keys, method) >= 0
+
+    # single key versions, so the table can also be used like a HashTable
+    def insert(self, x, method="linear"):
+        return self.insertBatch([x], method)
+
+    def search(self, x, method="linear"):
+        j = int(self.getBatch([x], method)[0])
+        return None if j < 0 else j
+
+# Key/value map built on HashTable's probing
+# Any hashable key can be used: the probe sequences are computed from
+# hash(key). Every slot of the underlying HashTable is either None (never
+# used), TOMBSTONE (its entry was deleted, but probing must continue past
+# it) or a (hash, key, value) tuple.
+#
+# Once the used slots (live entries plus tombstones) pass 'maxLoad' of the
+# table, a new table with a prime size is allocated. Instead of rehashing
+# everything at once, every later get/put/delete moves the next
+# 'migrateSlots' slots of the old table across, so no single operation has
+# to pay for the whole rehash. While that is going on, lookups check the new
+# table first and then the old one.
+
+TOMBSTONE = object()
+
+PROBES = {"linear": "linearProbe", "quadratic": "quadraticProbe", "double hash": "doubleHashProbe"}
+
+# returns the smallest prime >= n
+def nextPrime(n):
+    n = max(n, 2)
+    while any(n % d == 0 for d in range(2, int(n ** 0.5) + 1)):
+        n += 1
+    return n
+
+class HashMap(object):
+    # PARAMETERS
+    # 'size' - initial number of slots (rounded up to a prime)
+    # 'method' - "linear", "quadratic" or "double hash", as in HashTable.insert
+    # 'maxLoad' - fraction of used slots that starts a resize. Quadratic
+    #   probing only reaches half of the slots of a prime-sized table, so it
+    #   needs maxLoad <= 0.5
+    # 'migrateSlots' - old slots moved per operation while resizing (None
+    #   rehashes everything at once)
+    def __init__(self, size=11, method="linear", maxLoad=0.5, migrateSlots=4):
+        if method not in PROBES:
+            raise ValueError(f"unknown probing method {method!r}")
+        if not 0 < maxLoad < 1 or (method == "quadratic" and maxLoad > 0.5):
+            raise ValueError("maxLoad must be between 0 and 1 (at most 0.5 for quadratic probing)")
+        self.method = method
+        self.probe = getattr(HashTable, PROBES[method]) # called as probe(table, h, i)
+        self.maxLoad = maxLoad
+        self.migrateSlots = migrateSlots
+        self.table = HashTable(nextPrime(size))
+        self.used = 0 # slots of self.table that aren't None
+        self.count = 0 # live entries in both tables
+        self.oldTable = None # table being migrated away from
+        self.migrated = 0 # slots of oldTable already moved
+
+    def __len__(self):
+        return self.count
+
+    def __contains__(self, key):
+        return self._locate(key)[0] is not None
+
+    # The probe loops below start at h1(h) = h % size and only call the
+    # HashTable probe function after a collision, which most operations
+    # never have at a load of 0.5 or less.
+
+    # returns the index of 'key' in table 't', or None
+    def _find(self, t, h, key):
+        slots = t.table
+        j = h % t.size
+        for i in range(1, t.size + 1):
+            entry = slots[j]
+            if entry is None:
+                return None
+            if entry is not TOMBSTONE and entry[0] == h and (entry[1] is key or entry[1] == key):
+                return j
+            j = self.probe(t, h, i)
+        return None
+
+    # returns (table, index) of 'key', or (None, None) if it isn't stored
+    def _locate(self, key):
+        h = hash(key)
+        j = self._find(self.table, h, key)
+        if j is not None:
+            return self.table, j
+        if self.oldTable is not None:
+            j = self._find(self.oldTable, h, key)
+            if j is not None:
+                return self.oldTable, j
+        return None, None
+
+    # puts an entry for a key that isn't in self.table into the first free
+    # slot (None or TOMBSTONE) of its probe sequence
+    def _place(self, entry):
+        t = self.table
+        slots = t.table
+        h = entry[0]
+        j = h % t.size
+        for i in range(1, t.size + 1):
+            slot = slots[j]
+            if slot is None or slot is TOMBSTONE:
+                if slot is None:
+                    self.used += 1
+                slots[j] = entry
+                return
+            j = self.probe(t, h, i)
+        # only possible if the probe sequence misses the free slots
+        raise RuntimeError("no free slot found on the probe sequence")
+
+    # moves up to 'n' slots of the old table into the current one
+    def _migrate(self, n):
+        old = self.oldTable
+        oldSlots = old.table
+        end = min(self.migrated + n, old.size)
+        for j in range(self.migrated, end):
+            entry = oldSlots[j]
+            if entry is not None and entry is not TOMBSTONE:
+                self._place(entry)
+                # a tombstone keeps the probe sequences of the entries still
+                # waiting in the old table intact (empty slots stay empty, so
+                # misses stop as early as they did before)
+                oldSlots[j] = TOMBSTONE
+        self.migrated = end
+        if end == old.size:
+            self.oldTable = None
+
+    def _step(self):
+        if self.oldTable is not None:
+            self._migrate(self.migrateSlots if self.migrateSlots is not None else self.oldTable.size)
+
+    # starts moving everything to a new table sized for the live entries
+    def _resize(self):
+        if self.oldTable is not None:
+            self._migrate(self.oldTable.size) # finish the previous resize first
+        self.oldTable = self.table
+        self.migrated = 0
+        # new size keeps the load at half of maxLoad, leaving room for the
+        # inserts that happen while the migration is in progress
+        self.table = HashTable(nextPrime(int(2 * (self.count + 1) / self.maxLoad)))
+        self.used = 0
+        self._step()
+
+    ''' MAP OPERATIONS '''
+
+    # returns the value stored for 'key', or 'default' if there is none
+    def get(self, key, default=None):
+        if self.oldTable is not None:
+            self._step()
+        t, j = self._locate(key)
+        if t is None:
+            return default
+        return t.table[j][2]
+
+    # stores 'value' for 'key', replacing any previous value
+    def put(self, key, value):
+        if self.oldTable is not None:
+            self._step()
+        h = hash(key)
+        entry = (h, key, value)
+        # one pass over the probe sequence both looks for the key and finds
+        # the slot a new entry would go into (the first tombstone, or else
+        # the empty slot that ends the sequence)
+        t = self.table
+        slots = t.table
+        j = h % t.size
+        free = None
+        for i in range(1, t.size + 1):
+            slot = slots[j]
+            if slot is None:
+                break
+            if slot is TOMBSTONE:
+                if free is None:
+                    free = j
+            elif slot[0] == h and (slot[1] is key or slot[1] == key):
+                slots[j] = entry
+                return
+            j = self.probe(t, h, i)
+        else:
+            j = None # went all the way around without an empty slot
+        if self.oldTable is not None:
+            k = self._find(self.oldTable, h, key)
+            if k is not None:
+                # move it over now rather than updating it in the old table
+                self.oldTable.table[k] = TOMBSTONE
+                self.count -= 1
+        if free is not None:
+            # reusing a tombstone doesn't raise the load
+            slots[free] = entry
+        elif j is None:
+            # only possible if the probe sequence misses the free slots
+            raise RuntimeError("no free slot found on the probe sequence")
+        elif self.used + 1 > self.maxLoad * t.size:
+            self._resize()
+            self._place(entry)
+        else:
+            slots[j] = entry
+            self.used += 1
+        self.count += 1
+
+    # returns True if 'key' was found and removed
+    def delete(self, key):
+        if self.oldTable is not None:
+            self._step()
+        t, j = self._locate(key)
+        if t is None:
+            return False
+        t.table[j] = TOMBSTONE
+        self.count -= 1
+        return True
+
+# PARAMETERS
+# 'size' - number of slots (a prime, so that double hashing reaches them all)
+# 'load' - fraction of the table to fill with random values
+# 'method' - "linear", "quadratic", "double hash" or "robin hood"
+# returns (average probes for a hit, longest probe sequence for a hit,
+# microseconds per successful lookup, microseconds per failed lookup)
+def measureProbing(size, load, method):
+    hashTable = RobinHoodHashTable(size) if method == "robin hood" else HashTable(size)
+    values = random.sample(range(size * 100), int(size * load) + size // 10)
+    stored, missing = values[:int(size * load)], values[int(size * load):]
+    # a value found after c collisions takes c + 1 probes to look up
+    probes = [hashTable.insert(x, method) + 1 for x in stored]
+    startTime = time.perf_counter()
+    for x in stored:
+        hashTable.search(x, method)
+    hitTime = (time.perf_counter() - startTime) / len(stored) * 1e6
+    startTime = time.perf_counter()
+    for x in missing:
+        hashTable.search(x, method)
+    missTime = (time.perf_counter() - startTime) / len(missing) * 1e6
+    if method == "robin hood":
+        # values move while others are inserted, so count their final distances
+        probes = [hashTable.dist[j] + 1 for j in range(size) if hashTable.table[j] is not None]
+    return sum(probes) / len(probes), max(probes), hitTime, missTime
+
+# PARAMETERS
+# 'size' - number of slots (a prime, so that double hashing reaches them all)
+# 'load' - fraction of the table to fill with random values
+# 'method' - "linear", "quadratic", "double hash" or "cuckoo" (two hash
+#   functions and buckets of 4 slots)
+# 'lookups' - number of lookups to time, half of them hits and half misses
+# returns (median, 99th percentile and worst lookup latency in nanoseconds,
+# and the most slots any of the lookups looked at)
+def measureLookupLatency(size, load, method, lookups=20000):
+    if method == "cuckoo":
+        # the table must not grow before reaching 'load'
+        hashTable = CuckooHashTable(size, maxLoad=max(load, 0.9) + 0.01)
+    else:
+        hashTable = HashTable(size)
+    n = int(size * load)
+    values = random.sample(range(size * 100), n + lookups // 2)
+    stored, missing = values[:n], values[n:]
+    for x in stored:
+        hashTable.insert(x, method)
+    queries = random.choices(stored, k=lookups - lookups // 2) + missing
+    random.shuffle(queries)
+    latencies = []
+    for x in queries:
+        startTime = time.perf_counter_ns()
+        hashTable.search(x, method)
+        latencies.append(time.perf_counter_ns() - startTime)
+    latencies.sort()
+    # count the probes in a second pass, so recording them isn't timed
+    hashTable.stats = HashTableStats()
+    for x in queries:
+        hashTable.search(x, method)
+    longest = max(row["max"] for row in hashTable.stats.summary())
+    return latencies[len(latencies) // 2], latencies[int(len(latencies) * 0.99)], latencies[-1], longest
+
+# PARAMETERS
+# 'size' - number of slots of every table
+# 'keys' - values inserted into one table per method
+# 'missing' - values that aren't in 'keys', looked up to measure misses
+# 'methods' - probing methods to compare ("robin hood" uses a
+#   RobinHoodHashTable, the others a HashTable)
+# returns a HashTableStats holding the inserts, hits and misses of every
+# method and the clusters each table ends up with
+def compareMethods(size, keys, missing, methods=("linear", "quadratic", "double hash", "robin hood"), sampleEvery=100):
+    stats = HashTableStats(sampleEvery)
+    for method in methods:
+        if method == "robin hood":
+            hashTable = RobinHoodHashTable(size, stats)
+        else:
+            hashTable = HashTable(size, stats)
+        for x in keys:
+            hashTable.insert(x, method)
+        for x in keys:
+            hashTable.search(x, method)
+        for x in missing:
+            hashTable.search(x, method)
+        stats.recordClusters(hashTable, method)
+    return stats
+
+# PARAMETERS
+# 'size' - number of slots
+# 'batches' - number of batches of random keys (with some repeats) to insert
+# 'load' - fraction of the table the batches fill together
+# 'method' - "linear", "quadratic" or "double hash"
+# returns True if a BatchHashTable fed the batches ends up with the same
+# slots, and reports the same collisions, hits and misses, as a HashTable
+# that gets the same keys one at a time
+def checkBatchInsert(size, batches, load, method):
+    keys = [random.randint(0, size * 20) for _ in range(int(size * load))]
+    sequential = HashTable(size, HashTableStats())
+    batch = BatchHashTable(size, HashTableStats())
+    same = True
+    for i in range(batches):
+        part = keys[i * len(keys) // batches:(i + 1) * len(keys) // batches]
+        collisions = sum(sequential.insert(key, method) for key in part)
+        same = same and batch.insertBatch(part, method) == collisions
+    lookups = keys + [random.randint(0, size * 20) for _ in range(size // 10)]
+    slots = [sequential.search(key, method) for key in lookups]
+    found = batch.getBatch(lookups, method).tolist()
+    same = same and found == [-1 if j is None else j for j in slots]
+    same = same and list(batch.table) == sequential.table and batch.count == sequential.count
+    return same and batch.stats.summary() == sequential.stats.summary()
+
+# PARAMETERS
+# 'n' - number of random keys, inserted into a table at 70% load
+# 'method' - "linear", "quadratic" or "double hash"
+# returns (sequential insert time, batch insert time, sequential lookup
+# time, batch lookup time, whether both tables ended up the same)
+def benchmarkBatch(n, method):
+    size = nextPrime(int(n / 0.7))
+    keys = random.sample(range(n * 100), n)
+    sequential = HashTable(size)
+    startTime = time.perf_counter()
+    for key in keys:
+        sequential.insert(key, method)
+    insertTime = time.perf_counter() - startTime
+    startTime = time.perf_counter()
+    for key in keys:
+        sequential.search(key, method)
+    lookupTime = time.perf_counter() - startTime
+
+    batch = BatchHashTable(size)
+    keyArray = np.array(keys, dtype=np.int64)
+    startTime = time.perf_counter()
+    batch.insertBatch(keyArray, method)
+    batchInsertTime = time.perf_counter() - startTime
+    startTime = time.perf_counter()
+    batch.containsBatch(keyArray, method)
+    batchLookupTime = time.perf_counter() - startTime
+
+    layout = [int(key) if used else None for key, used in zip(batch.keys, batch.used)]
+    return insertTime, batchInsertTime, lookupTime, batchLookupTime, layout == sequential.table
+
+# PARAMETERS
+# 'n' - number of keys to put (the map starts small, so it resizes many
+#   times on the way)
+# 'migrateSlots' - passed to HashMap (None rehashes everything at once)
+# returns (puts per second, median, 99th percentile, 99.9th percentile and
+# worst put latency in microseconds)
+def benchmarkHashMap(n, migrateSlots, method="linear"):
+    hashMap = HashMap(method=method, migrateSlots=migrateSlots)
+    keys = random.sample(range(n * 10), n)
+    latencies = []
+    startTime = time.perf_counter()
+    for key in keys:
+        opStart = time.perf_counter_ns()
+        hashMap.put(key, key)
+        latencies.append(time.perf_counter_ns() - opStart)
+    total = time.perf_counter() - startTime
+    latencies.sort()
+    percentile = lambda p: latencies[min(int(p * n), n - 1)] / 1000
+    return n / total, percentile(0.5), percentile(0.99), percentile(0.999), latencies[-1] / 1000
+
 def main():
     # create random sequence of integers
     print()
@@ -86,6 +1010,64 @@ def main():
         collisionCount += hashTable.insert(randomSequence[i], method="double hash")
     print(f"double hashing collisions: {collisionCount}")
     print()
+
+    # probe lengths and lookup times as the table fills up
+    print("Probe lengths and lookup times in a table of 10007 slots")
+    print("(average / longest probes for a hit, microseconds per hit / miss)")
+    print()
+    for load in [0.5, 0.6, 0.7, 0.8, 0.9, 0.95]:
+        for method in ["linear", "quadratic", "double hash", "robin hood"]:
+            average, longest, hitTime, missTime = measureProbing(10007, load, method)
+            print(f"load {load:.2f}, {method}: {average:.2f} / {longest} probes, "
+                  f"{hitTime:.2f} / {missTime:.2f} us")
+    print()
+
+    # lookup latency as the table fills up, against cuckoo hashing
+    print("Lookup latency in a table of 10007 slots, half hits and half misses")
+    print("(nanoseconds p50 / p99 / max, most slots looked at by one lookup)")
+    print()
+    for load in [0.5, 0.7, 0.8, 0.9, 0.95]:
+        for method in ["linear", "quadratic", "double hash", "cuckoo"]:
+            p50, p99, worst, longest = measureLookupLatency(10007, load, method)
+            print(f"load {load:.2f}, {method}: {p50} / {p99} / {worst} ns, {longest} slots")
+    print()
+
+    # probe length distributions of every method on the same keys
+    print("Probe lengths for 7000 keys in a table of 10007 slots")
+    print("(mean / median / 99th percentile / longest)")
+    print()
+    values = random.sample(range(10007 * 100), 8000)
+    stats = compareMethods(10007, values[:7000], values[7000:])
+    for row in stats.summary():
+        print(f"{row['method']} {row['operation']}: {row['mean']:.2f} / {row['p50']} / "
+              f"{row['p99']} / {row['max']} probes over {row['count']} operations")
+    for method, sizes in stats.clusters.items():
+        print(f"{method}: {sum(sizes.values())} clusters, largest {max(sizes)} slots")
+    print()
+
+    # NumPy batch insert and lookup against one key at a time
+    if np is not None:
+        for method in ["linear", "quadratic", "double hash"]:
+            same = all(checkBatchInsert(size, batches, load, method)
+                       for size in [11, 101, 1009] for batches in [1, 3] for load in [0.3, 0.7, 0.9])
+            print(f"{method}: batch inserts and lookups match one at a time: {same}")
+        print()
+        print("Inserting and looking up 200000 keys at 70% load, one at a time vs. as one batch")
+        print()
+        for method in ["linear", "double hash"]:
+            insertTime, batchInsertTime, lookupTime, batchLookupTime, same = benchmarkBatch(200000, method)
+            print(f"{method}: insert {insertTime:.3f}s vs {batchInsertTime:.3f}s, "
+                  f"lookup {lookupTime:.3f}s vs {batchLookupTime:.3f}s, same layout: {same}")
+        print()
+
+    # key/value map growing from 11 slots to hold 100000 keys
+    print("HashMap: putting 100000 keys into a map that starts with 11 slots")
+    print()
+    for label, migrateSlots in [("incremental resizing", 4), ("rehash all at once", None)]:
+        opsPerSec, p50, p99, p999, worst = benchmarkHashMap(100000, migrateSlots)
+        print(f"{label}: {opsPerSec:.0f} puts/sec, latency (us) p50 {p50:.1f}, "
+              f"p99 {p99:.1f}, p99.9 {p999:.1f}, max {worst:.1f}")
+    print()
     
 if __name__ == '__main__':
     main()
@@ -1,17 +1,34 @@
 # Max Heap Implementation and Methods
 
+import asyncio
+import queue
 import random
+import tempfile
+import threading
 import time
+from array import array
 
-class MaxHeap:
+# extend rebuilds the heap instead of inserting one at a time when the batch
+# is at least 1/EXTEND_REBUILD_RATIO of the current heap size. Random inserts
+# rarely sift far, so below about half the heap size inserting one at a time
+# is cheaper even though its worst case is worse
+EXTEND_REBUILD_RATIO = 2
+
+# Binary heap in a list: the parts MaxHeap and MinHeap share. Subclasses
+# supply _heapifyUp/_heapifyDown for their ordering and name the operations
+# on the root (getMax/removeMax, getMin/removeMin)
+class BinaryHeap:
     def __init__(self, arr=None):
         if arr is None:
             self.heap = []
         else:
             self.heap = arr.copy()
-            # heapify tree
-            for i in range((len(self.heap)-2)//2, -1, -1): 
-                self._heapifyDown(i)
+            self._buildHeap()
+
+    # heapify tree bottom up in O(n)
+    def _buildHeap(self):
+        for i in range((len(self.heap)-2)//2, -1, -1): 
+            self._heapifyDown(i)
     
     def parent(self, i):
         return (i-1)//2
@@ -21,7 +38,56 @@ class MaxHeap:
     
     def rightChild(self, i):
         return (2*i) + 2
-    
+
+    def insert(self, element):
+        self.heap.append(element) 
+        self._heapifyUp(len(self.heap)-1) # heapify up from last ele
+
+    # PARAMETERS
+    # 'elements' - iterable of elements to insert
+    # inserting k elements one at a time costs O(k log(n+k)), while
+    # rebuilding the whole heap bottom up costs O(n+k); the rebuild is used
+    # once the batch is large compared to the heap
+    def extend(self, elements):
+        batch = list(elements)
+        if len(batch) * EXTEND_REBUILD_RATIO >= len(self.heap):
+            self.heap.extend(batch)
+            self._buildHeap()
+        else:
+            for element in batch:
+                self.insert(element)
+
+    def printHeap(self):
+        print(self.heap)
+
+    # returns the root (None if empty)
+    def _peek(self):
+        if len(self.heap) > 0:
+            return self.heap[0]
+        return None
+
+    # removes and returns the root (None if empty)
+    def _pop(self):
+        if len(self.heap) == 0:
+            return None
+        top = self.heap[0]
+        self.heap[0], self.heap[-1] = self.heap[-1], self.heap[0] # swap root with last element in list
+        self.heap.pop() # remove last ele
+        self._heapifyDown(0) # heapify down to restore properties
+        return top
+
+    # removes and returns the root (None if empty) and then inserts
+    # 'element', with a single sift down
+    def replace(self, element):
+        if len(self.heap) == 0:
+            self.heap.append(element)
+            return None
+        top = self.heap[0]
+        self.heap[0] = element
+        self._heapifyDown(0)
+        return top
+
+class MaxHeap(BinaryHeap):
     def _heapifyUp(self, i):
         parent = self.parent(i)
         # swap 
@@ -44,27 +110,641 @@ class MaxHeap:
             left = self.leftChild(i)
             right = self.rightChild(i)
 
-    def insert(self, element):
-        self.heap.append(element) 
-        self._heapifyUp(len(self.heap)-1) # heapify up from last ele
-
     def getMax(self):
+        return self._peek()
+
+    def removeMax(self):
+        return self._pop()
+
+    # Fused operations: each does a single sift down instead of the two
+    # passes of a separate removeMax and insert (replace is BinaryHeap's)
+
+    # inserts 'element' and then removes and returns the max
+    def pushpop(self, element):
+        if len(self.heap) == 0 or element >= self.heap[0]:
+            return element # element would come straight back out
+        maxval = self.heap[0]
+        self.heap[0] = element
+        self._heapifyDown(0)
+        return maxval
+
+# Min heap: same layout as MaxHeap with the comparisons flipped, so the root
+# holds the smallest element
+class MinHeap(BinaryHeap):
+    def _heapifyUp(self, i):
+        heap = self.heap
+        parent = self.parent(i)
+        while i != 0 and heap[i] < heap[parent]:
+            heap[i], heap[parent] = heap[parent], heap[i]
+            i = parent
+            parent = self.parent(i)
+
+    def _heapifyDown(self, i):
+        heap = self.heap
+        n = len(heap)
+        while True:
+            left = self.leftChild(i)
+            right = self.rightChild(i)
+            smallest = i
+            if left < n and heap[left] < heap[smallest]:
+                smallest = left
+            if right < n and heap[right] < heap[smallest]:
+                smallest = right
+            if smallest == i:
+                return
+            heap[i], heap[smallest] = heap[smallest], heap[i]
+            i = smallest
+
+    # inserts 'element' and then removes and returns the min
+    def pushpop(self, element):
+        if len(self.heap) == 0 or element <= self.heap[0]:
+            return element
+        minval = self.heap[0]
+        self.heap[0] = element
+        self._heapifyDown(0)
+        return minval
+
+    def getMin(self):
+        return self._peek()
+
+    def removeMin(self):
+        return self._pop()
+
+# PARAMETERS
+# 'iterable' - elements to scan (read only once, so it may be a stream)
+# 'k' - number of elements to keep
+# returns the k largest elements, largest first. Only a min heap of the k
+# best seen so far is kept in memory: a new element replaces its root when
+# it beats the smallest of them
+def nLargest(iterable, k):
+    if k <= 0:
+        return []
+    best = MinHeap()
+    for element in iterable:
+        if len(best.heap) < k:
+            best.insert(element)
+        elif element > best.heap[0]:
+            best.replace(element)
+    result = []
+    while best.heap:
+        result.append(best.removeMin())
+    result.reverse()
+    return result
+       
+# Indexed max heap: every entry gets a handle when it is inserted, and the
+# heap keeps each handle's current position up to date as entries move.
+# That lets a caller change the priority of, or remove, any entry in
+# O(log n) instead of searching for it or rebuilding the heap.
+# self.heap still holds just the priorities, so getMax and printHeap work as
+# before; self.handles holds the handle of each entry at the same index.
+
+class HeapHandle:
+    def __init__(self, item, index):
+        self.item = item # whatever the caller attached to the entry
+        self.index = index # position in the heap (None once removed)
+
+class IndexedMaxHeap(MaxHeap):
+    def __init__(self, arr=None):
+        arr = [] if arr is None else arr
+        self.handles = [HeapHandle(None, i) for i in range(len(arr))]
+        super().__init__(arr)
+
+    def _swap(self, i, j):
+        heap, handles = self.heap, self.handles
+        heap[i], heap[j] = heap[j], heap[i]
+        handles[i], handles[j] = handles[j], handles[i]
+        handles[i].index = i
+        handles[j].index = j
+
+    def _heapifyUp(self, i):
+        parent = self.parent(i)
+        while i != 0 and self.heap[i] > self.heap[parent]:
+            self._swap(i, parent)
+            i = parent
+            parent = self.parent(i)
+
+    def _heapifyDown(self, i):
+        heap = self.heap
+        n = len(heap)
+        while True:
+            left = self.leftChild(i)
+            right = self.rightChild(i)
+            biggest = i
+            if left < n and heap[left] > heap[biggest]:
+                biggest = left
+            if right < n and heap[right] > heap[biggest]:
+                biggest = right
+            if biggest == i:
+                return
+            self._swap(i, biggest)
+            i = biggest
+
+    # PARAMETERS
+    # 'priority' - priority of the new entry
+    # 'item' - optional value to attach to the entry
+    # returns the entry's handle
+    def insert(self, priority, item=None):
+        handle = HeapHandle(item, len(self.heap))
+        self.heap.append(priority)
+        self.handles.append(handle)
+        self._heapifyUp(handle.index)
+        return handle
+
+    def getPriority(self, handle):
+        self._checkHandle(handle)
+        return self.heap[handle.index]
+
+    # returns the handle of the entry with the highest priority
+    def getMaxHandle(self):
         if len(self.heap) > 0:
-            return self.heap[0]
+            return self.handles[0]
         return None
 
     def removeMax(self):
         if len(self.heap) == 0:
             return None
         maxval = self.heap[0]
-        self.heap[0], self.heap[-1] = self.heap[-1], self.heap[0] # swap first element (max) with last element in list
-        self.heap.pop() # remove last ele
-        self._heapifyDown(0) # heapify down to restore properties
+        self.remove(self.handles[0])
+        return maxval
+
+    # like removeMax, but returns the removed entry's handle
+    def removeMaxHandle(self):
+        if len(self.heap) == 0:
+            return None
+        handle = self.handles[0]
+        self.remove(handle)
+        return handle
+
+    # PARAMETERS
+    # 'handle' - handle returned by insert
+    # 'priority' - new priority, which may be higher or lower than the old one
+    def updatePriority(self, handle, priority):
+        self._checkHandle(handle)
+        i = handle.index
+        old = self.heap[i]
+        self.heap[i] = priority
+        if priority > old:
+            self._heapifyUp(i)
+        elif priority < old:
+            self._heapifyDown(i)
+
+    # removes the entry of 'handle' from the heap
+    def remove(self, handle):
+        self._checkHandle(handle)
+        i = handle.index
+        last = len(self.heap) - 1
+        # move the last entry into the hole and sift it whichever way it needs
+        self._swap(i, last)
+        self.heap.pop()
+        self.handles.pop()
+        handle.index = None
+        if i < last:
+            self._heapifyUp(i)
+            self._heapifyDown(i)
+
+    # every entry needs a handle, so a batch is inserted one at a time
+    # returns the handles of the new entries
+    def extend(self, elements):
+        return [self.insert(element) for element in elements]
+
+    # Fused operations with handles: both return ((priority, item) of the
+    # removed entry, handle of the new entry)
+
+    # inserts an entry and then removes the max. If the new entry is the
+    # max it comes straight back out, and its handle is already removed
+    def pushpop(self, priority, item=None):
+        if len(self.heap) == 0 or priority >= self.heap[0]:
+            return (priority, item), HeapHandle(item, None)
+        return self._replaceMax(priority, item)
+
+    # removes the max and then inserts an entry. The removed entry is None
+    # if the heap was empty
+    def replace(self, priority, item=None):
+        if len(self.heap) == 0:
+            return None, self.insert(priority, item)
+        return self._replaceMax(priority, item)
+
+    # puts a new entry in the root's place with a single sift down
+    def _replaceMax(self, priority, item):
+        old = self.handles[0]
+        removed = (self.heap[0], old.item)
+        old.index = None
+        handle = HeapHandle(item, 0)
+        self.heap[0] = priority
+        self.handles[0] = handle
+        self._heapifyDown(0)
+        return removed, handle
+
+    def _checkHandle(self, handle):
+        i = handle.index
+        if i is None or i >= len(self.handles) or self.handles[i] is not handle:
+            raise ValueError("handle is not in this heap")
+
+# d-ary max heap: every node has up to 'd' children, so the tree is only
+# log base d of n levels deep. Inserts sift up through fewer levels, and
+# removeMax does fewer (if wider) steps down, which pays off in Python where
+# each step of a loop is expensive.
+# Keys can be kept in an array.array instead of a list, which stores plain
+# numbers rather than one Python object per key (less memory, though reading
+# them back is a little slower). A value can be attached to each key; values
+# live in a parallel list that is only created once the first value is given.
+# Sifting moves a "hole" instead of swapping: the entries on the way are
+# shifted by one level and the moving entry is written once at the end.
+
+class DaryHeap:
+    # PARAMETERS
+    # 'd' - number of children per node (2 or more)
+    # 'typecode' - array.array typecode for the keys (e.g. 'q' or 'd'), or
+    #   None to keep them in a list
+    # 'arr' - optional keys to build the heap from
+    def __init__(self, d=8, typecode=None, arr=None):
+        if d < 2:
+            raise ValueError("d must be at least 2")
+        self.d = d
+        self.keys = array(typecode) if typecode is not None else []
+        self.values = None # parallel list of values, once there are any
+        if arr is not None:
+            self.keys.extend(arr)
+            # heapify bottom up, starting from the parent of the last key
+            for i in range((len(self.keys) - 2) // d, -1, -1):
+                self._siftDown(i, self.keys[i], None)
+
+    def __len__(self):
+        return len(self.keys)
+
+    def _siftUp(self, i, key, value):
+        keys, values, d = self.keys, self.values, self.d
+        while i > 0:
+            parent = (i - 1) // d
+            parentKey = keys[parent]
+            if parentKey >= key:
+                break
+            keys[i] = parentKey
+            if values is not None:
+                values[i] = values[parent]
+            i = parent
+        keys[i] = key
+        if values is not None:
+            values[i] = value
+
+    def _siftDown(self, i, key, value):
+        keys, values, d = self.keys, self.values, self.d
+        n = len(keys)
+        while True:
+            first = d * i + 1
+            if first >= n:
+                break
+            # the biggest of the (up to) d children, found with the builtin
+            # max and index so the scan runs in C rather than in a loop here
+            biggestKey = max(keys[first:first + d])
+            if biggestKey <= key:
+                break
+            biggest = keys.index(biggestKey, first)
+            keys[i] = biggestKey
+            if values is not None:
+                values[i] = values[biggest]
+            i = biggest
+        keys[i] = key
+        if values is not None:
+            values[i] = value
+
+    def insert(self, key, value=None):
+        if value is not None and self.values is None:
+            self.values = [None] * len(self.keys)
+        self.keys.append(key)
+        if self.values is not None:
+            self.values.append(value)
+        self._siftUp(len(self.keys) - 1, key, value)
+
+    def getMax(self):
+        if len(self.keys) > 0:
+            return self.keys[0]
+        return None
+
+    def removeMax(self):
+        keys = self.keys
+        if len(keys) == 0:
+            return None
+        maxval = keys[0]
+        key = keys.pop()
+        value = self.values.pop() if self.values is not None else None
+        if len(keys) > 0:
+            self._siftDown(0, key, value)
         return maxval
 
+    # like removeMax, but returns (key, value)
+    def removeMaxItem(self):
+        if len(self.keys) == 0:
+            return None
+        value = self.values[0] if self.values is not None else None
+        return self.removeMax(), value
+
     def printHeap(self):
-        print(self.heap)
-       
+        print(list(self.keys))
+
+# Pairing heap (max): a heap-ordered tree where a node can have any number of
+# children, kept as a linked list (child points to the first one, next/prev
+# link the siblings; the first child's prev points to its parent).
+# Two heaps are melded by making the root with the smaller key a child of the
+# other root, which is O(1), and insert and increaseKey are melds too.
+# removeMax pairs up the root's children left to right and then melds the
+# pairs right to left, which is O(log n) amortized.
+
+class PairingNode:
+    def __init__(self, key, value=None):
+        self.key = key
+        self.value = value
+        self.child = None
+        self.next = None
+        self.prev = None
+
+class PairingHeap:
+    def __init__(self, arr=None):
+        self.root = None
+        self.size = 0
+        if arr is not None:
+            for element in arr:
+                self.insert(element)
+
+    def __len__(self):
+        return self.size
+
+    # links two roots and returns the new root
+    def _link(self, a, b):
+        if b.key > a.key:
+            a, b = b, a
+        # b becomes a's first child
+        b.next = a.child
+        if a.child is not None:
+            a.child.prev = b
+        b.prev = a
+        a.child = b
+        return a
+
+    # PARAMETERS
+    # 'key' - priority of the new entry
+    # 'value' - optional value to attach to it
+    # returns the new node, which can be passed to increaseKey
+    def insert(self, key, value=None):
+        node = PairingNode(key, value)
+        self.root = node if self.root is None else self._link(self.root, node)
+        self.size += 1
+        return node
+
+    def getMax(self):
+        if self.root is not None:
+            return self.root.key
+        return None
+
+    def removeMax(self):
+        node = self.removeMaxNode()
+        return None if node is None else node.key
+
+    # like removeMax, but returns the removed node
+    def removeMaxNode(self):
+        root = self.root
+        if root is None:
+            return None
+        # first pass: link the children in pairs, left to right
+        pairs = []
+        x = root.child
+        while x is not None:
+            a = x
+            b = x.next
+            if b is None:
+                x = None
+                a.prev = a.next = None
+                pairs.append(a)
+            else:
+                x = b.next
+                a.prev = a.next = b.prev = b.next = None
+                pairs.append(self._link(a, b))
+        # second pass: meld the pairs, right to left
+        newRoot = pairs.pop() if pairs else None
+        while pairs:
+            newRoot = self._link(pairs.pop(), newRoot)
+        self.root = newRoot
+        self.size -= 1
+        root.child = None
+        return root
+
+    # moves every entry of 'other' into this heap in O(1), leaving 'other'
+    # empty
+    def meld(self, other):
+        if other is self or other.root is None:
+            return
+        self.root = other.root if self.root is None else self._link(self.root, other.root)
+        self.size += other.size
+        other.root = None
+        other.size = 0
+
+    # PARAMETERS
+    # 'node' - node returned by insert, still in this heap
+    # 'key' - new key, which must not be smaller than the current one
+    def increaseKey(self, node, key):
+        if key < node.key:
+            raise ValueError("new key is smaller than the current key")
+        node.key = key
+        if node is self.root:
+            return
+        # cut node (with its subtree) out of its parent's list of children
+        # and meld it back in at the root
+        if node.prev.child is node:
+            node.prev.child = node.next
+        else:
+            node.prev.next = node.next
+        if node.next is not None:
+            node.next.prev = node.prev
+        node.prev = node.next = None
+        self.root = self._link(self.root, node)
+
+    def printHeap(self):
+        # keys in the order the nodes are stored, root first
+        keys = []
+        stack = [self.root] if self.root is not None else []
+        while stack:
+            x = stack.pop()
+            keys.append(x.key)
+            if x.next is not None:
+                stack.append(x.next)
+            if x.child is not None:
+                stack.append(x.child)
+        print(keys)
+
+# Priority queues for passing work between threads or coroutines, built on
+# MaxHeap: get always returns the largest item. A queue with maxsize > 0
+# makes put wait while it is full, which slows producers down to the pace of
+# the consumers. The lock is only held while the heap sifts, never while
+# waiting.
+
+class BlockingPriorityQueue:
+    # PARAMETERS
+    # 'maxsize' - most items the queue holds before put blocks (0 for no
+    #   limit)
+    def __init__(self, maxsize=0):
+        self.heap = MaxHeap()
+        self.maxsize = maxsize
+        self.lock = threading.Lock()
+        self.notEmpty = threading.Condition(self.lock)
+        self.notFull = threading.Condition(self.lock)
+
+    def qsize(self):
+        with self.lock:
+            return len(self.heap.heap)
+
+    def _full(self):
+        return 0 < self.maxsize <= len(self.heap.heap)
+
+    # waits while the queue is full; raises queue.Full if 'timeout' seconds
+    # pass first
+    def put(self, item, timeout=None):
+        with self.notFull:
+            if not self.notFull.wait_for(lambda: not self._full(), timeout):
+                raise queue.Full
+            self.heap.insert(item)
+            self.notEmpty.notify()
+
+    # waits while the queue is empty; raises queue.Empty if 'timeout'
+    # seconds pass first
+    def get(self, timeout=None):
+        with self.notEmpty:
+            if not self.notEmpty.wait_for(lambda: self.heap.heap, timeout):
+                raise queue.Empty
+            item = self.heap.removeMax()
+            self.notFull.notify()
+            return item
+
+    # waits for at least one item like get, then takes up to 'n' of them
+    # (largest first) while holding the lock only once
+    def getMany(self, n, timeout=None):
+        with self.notEmpty:
+            if not self.notEmpty.wait_for(lambda: self.heap.heap, timeout):
+                raise queue.Empty
+            items = []
+            while self.heap.heap and len(items) < n:
+                items.append(self.heap.removeMax())
+            self.notFull.notify(len(items))
+            return items
+
+class AsyncPriorityQueue:
+    # PARAMETERS
+    # 'maxsize' - most items the queue holds before put waits (0 for no
+    #   limit)
+    def __init__(self, maxsize=0):
+        self.heap = MaxHeap()
+        self.maxsize = maxsize
+        lock = asyncio.Lock()
+        self.notEmpty = asyncio.Condition(lock)
+        self.notFull = asyncio.Condition(lock)
+
+    def qsize(self):
+        return len(self.heap.heap)
+
+    def _full(self):
+        return 0 < self.maxsize <= len(self.heap.heap)
+
+    async def put(self, item):
+        async with self.notFull:
+            await self.notFull.wait_for(lambda: not self._full())
+            self.heap.insert(item)
+            self.notEmpty.notify()
+
+    async def get(self):
+        async with self.notEmpty:
+            await self.notEmpty.wait_for(lambda: self.heap.heap)
+            item = self.heap.removeMax()
+            self.notFull.notify()
+            return item
+
+    # waits for at least one item like get, then takes up to 'n' of them
+    async def getMany(self, n):
+        async with self.notEmpty:
+            await self.notEmpty.wait_for(lambda: self.heap.heap)
+            items = []
+            while self.heap.heap and len(items) < n:
+                items.append(self.heap.removeMax())
+            self.notFull.notify(len(items))
+            return items
+
+# External sort: sorts more integers than fit in memory. The input is cut
+# into runs of at most 'runSize' values, each run is sorted in memory and
+# spilled to a temporary file as packed 64-bit integers, and then all runs
+# are merged with a heap holding the next value of every run. Only one run,
+# plus one read buffer per run, is ever in memory.
+
+# yields the integers stored in 'f', reading 'bufferSize' of them at a time
+def _readRun(f, bufferSize):
+    f.seek(0)
+    while True:
+        buf = array('q')
+        try:
+            buf.fromfile(f, bufferSize)
+        except EOFError:
+            # fromfile still keeps whatever was left before the end
+            pass
+        if len(buf) == 0:
+            return
+        yield from buf
+
+# PARAMETERS
+# 'values' - iterable of integers (read only once, so it may be a stream)
+# 'runSize' - most values sorted in memory at a time
+# 'bufferSize' - values written to or read from a run file at a time
+# 'reverse' - sort largest first
+# 'tempDir' - directory for the run files (defaults to the system's)
+# yields the values in sorted order
+def externalSort(values, runSize=1000000, bufferSize=8192, reverse=False, tempDir=None):
+    runs = []
+    try:
+        buf = []
+        for value in values:
+            buf.append(value)
+            if len(buf) == runSize:
+                runs.append(_spillRun(buf, reverse, tempDir, bufferSize))
+                buf = []
+        if not runs:
+            # everything fit in one run, no need to touch the disk
+            buf.sort(reverse=reverse)
+            yield from buf
+            return
+        if buf:
+            runs.append(_spillRun(buf, reverse, tempDir, bufferSize))
+        del buf
+
+        # k-way merge: the heap holds (next value, run index) for every run
+        # that isn't used up; replace swaps in the run's next value with a
+        # single sift
+        readers = [_readRun(f, bufferSize) for f in runs]
+        heap = MaxHeap() if reverse else MinHeap()
+        removeRoot = heap.removeMax if reverse else heap.removeMin
+        entries = []
+        for i, reader in enumerate(readers):
+            for value in reader:
+                entries.append((value, i))
+                break
+        heap.extend(entries)
+        while heap.heap:
+            value, i = heap.heap[0]
+            yield value
+            nextValue = next(readers[i], None)
+            if nextValue is None:
+                removeRoot()
+            else:
+                heap.replace((nextValue, i))
+    finally:
+        for f in runs:
+            f.close()
+
+# sorts 'buf' and writes it to a new temporary file, which is returned.
+# It is written 'bufferSize' values at a time, so converting the run to
+# machine integers never needs a second copy of the whole run
+def _spillRun(buf, reverse, tempDir, bufferSize):
+    buf.sort(reverse=reverse)
+    f = tempfile.TemporaryFile(dir=tempDir)
+    for i in range(0, len(buf), bufferSize):
+        array('q', buf[i:i + bufferSize]).tofile(f)
+    return f
+
 def getInsertTime(heap, nums):
     startTime = time.time()
     for i in range(len(nums)):
@@ -74,10 +754,125 @@ def getInsertTime(heap, nums):
 
 def getBuildTime(nums):
     startTime = time.time()
-    heap = MaxHeap(nums)
+    MaxHeap(nums)
+    endTime = time.time()
+    return endTime - startTime
+
+def getExtendTime(heap, nums):
+    startTime = time.time()
+    heap.extend(nums)
+    endTime = time.time()
+    return endTime - startTime
+
+def getRemoveAllTime(heap):
+    startTime = time.time()
+    while heap.getMax() is not None:
+        heap.removeMax()
+    endTime = time.time()
+    return endTime - startTime
+
+# times 'len(nums)' rounds of taking out the max and putting in a new number,
+# either with removeMax followed by insert or with the fused replace
+def getReplaceTime(heap, nums, fused):
+    startTime = time.time()
+    if fused:
+        for num in nums:
+            heap.replace(num)
+    else:
+        for num in nums:
+            heap.removeMax()
+            heap.insert(num)
     endTime = time.time()
     return endTime - startTime
 
+# PARAMETERS
+# 'heapType' - MaxHeap or PairingHeap
+# 'shards' - lists of numbers, one heap is built from each
+# 'rounds' - number of times the shard heaps are rebuilt and merged into the
+#   main heap, which then gives up its largest len(shards) numbers
+# returns the time spent merging and removing (building is not timed)
+def getMergeTime(heapType, shards, rounds):
+    total = 0
+    merged = heapType()
+    for _ in range(rounds):
+        heaps = [heapType(shard) for shard in shards]
+        startTime = time.time()
+        for heap in heaps:
+            if heapType is PairingHeap:
+                merged.meld(heap)
+            else:
+                merged.extend(heap.heap)
+        for _ in range(len(shards)):
+            merged.removeMax()
+        total += time.time() - startTime
+    return total
+
+# PARAMETERS
+# 'producers', 'consumers' - number of threads of each kind
+# 'n' - number of items each producer puts
+# 'batch' - items a consumer takes per call (1 uses get, more uses getMany)
+# returns the number of items per second that went through the queue
+def getQueueThroughput(producers, consumers, n, batch=1, maxsize=1000):
+    q = BlockingPriorityQueue(maxsize)
+
+    def produce(seed):
+        rng = random.Random(seed)
+        for _ in range(n):
+            q.put(rng.randrange(1000000))
+
+    def consume():
+        while True:
+            items = q.getMany(batch) if batch > 1 else [q.get()]
+            # -1 is the stop signal, which sorts below every item. A batch
+            # may hold more than one, so hand the others back
+            stops = items.count(-1)
+            if stops:
+                for _ in range(stops - 1):
+                    q.put(-1)
+                return
+
+    threads = [threading.Thread(target=produce, args=(i,)) for i in range(producers)]
+    threads += [threading.Thread(target=consume) for _ in range(consumers)]
+    startTime = time.time()
+    for thread in threads:
+        thread.start()
+    for thread in threads[:producers]:
+        thread.join()
+    for _ in range(consumers):
+        q.put(-1)
+    for thread in threads[producers:]:
+        thread.join()
+    return producers * n / (time.time() - startTime)
+
+# same as getQueueThroughput with coroutines and an AsyncPriorityQueue
+def getAsyncQueueThroughput(producers, consumers, n, batch=1, maxsize=1000):
+    async def run():
+        q = AsyncPriorityQueue(maxsize)
+
+        async def produce(seed):
+            rng = random.Random(seed)
+            for _ in range(n):
+                await q.put(rng.randrange(1000000))
+
+        async def consume():
+            while True:
+                items = await q.getMany(batch) if batch > 1 else [await q.get()]
+                stops = items.count(-1)
+                if stops:
+                    for _ in range(stops - 1):
+                        await q.put(-1)
+                    return
+
+        consumerTasks = [asyncio.create_task(consume()) for _ in range(consumers)]
+        await asyncio.gather(*(produce(i) for i in range(producers)))
+        for _ in range(consumers):
+            await q.put(-1)
+        await asyncio.gather(*consumerTasks)
+
+    startTime = time.time()
+    asyncio.run(run())
+    return producers * n / (time.time() - startTime)
+
 def main():
     print("Heap methods with heap size = 100000")
     n = 100000
@@ -95,6 +890,7 @@ def main():
     time1 = getInsertTime(a, sortedNums)
     time2 = getInsertTime(b, reversedSortedNums)
     time3 = getInsertTime(c, randomNumbers)
+    insertTimes = (time1, time2, time3)
     
     print()
     print("Method 1: inserting elements into max heap one at a time")
@@ -116,5 +912,104 @@ def main():
     print(f"Random numbers time: {time3:.4f}")
     print()
 
+    # Method 1 and removing everything again, with d-ary heaps
+    print("d-ary heaps: inserting one at a time (sorted / reversed / random), then removing all")
+    print()
+    time1, time2, time3 = insertTimes
+    print(f"MaxHeap: {time1:.4f} / {time2:.4f} / {time3:.4f}, remove all: {getRemoveAllTime(c):.4f}")
+    for d, typecode in [(2, None), (4, None), (8, None), (8, 'q')]:
+        times = [getInsertTime(DaryHeap(d, typecode), nums)
+                 for nums in (sortedNums, reversedSortedNums)]
+        a = DaryHeap(d, typecode)
+        times.append(getInsertTime(a, randomNumbers))
+        times.append(getRemoveAllTime(a))
+        print(f"DaryHeap(d={d}, typecode={typecode}): "
+              f"{times[0]:.4f} / {times[1]:.4f} / {times[2]:.4f}, remove all: {times[3]:.4f}")
+    print()
+
+    # Method 3: extend an existing heap with a second batch of the same size
+    half = n // 2
+    a = MaxHeap(sortedNums[:half])
+    b = MaxHeap(sortedNums[:half])
+    c = MaxHeap(randomNumbers[:half])
+    time1 = getInsertTime(a, sortedNums[half:])
+    time2 = getExtendTime(b, sortedNums[half:])
+    time3 = getExtendTime(c, randomNumbers[half:])
+
+    print("Method 3: adding the second half of the numbers to a heap of the first half")
+    print()
+    print(f"Sorted numbers, one insert at a time: {time1:.4f}")
+    print(f"Sorted numbers, extend (rebuilds the heap): {time2:.4f}")
+    print(f"Random numbers, extend (rebuilds the heap): {time3:.4f}")
+    print()
+
+    # Fused replace against removeMax followed by insert
+    a = MaxHeap(randomNumbers)
+    b = MaxHeap(randomNumbers)
+    time1 = getReplaceTime(a, randomNumbers, fused=False)
+    time2 = getReplaceTime(b, randomNumbers, fused=True)
+
+    print(f"Replacing the max {n} times")
+    print()
+    print(f"removeMax then insert: {time1:.4f}")
+    print(f"replace: {time2:.4f}")
+    print()
+
+    # Top 10 of a stream against sorting everything
+    startTime = time.time()
+    top = nLargest(iter(randomNumbers), 10)
+    time1 = time.time() - startTime
+    startTime = time.time()
+    sorted(randomNumbers, reverse=True)[:10]
+    time2 = time.time() - startTime
+
+    print("Finding the 10 largest numbers")
+    print()
+    print(f"nLargest (keeps only 10 in memory): {time1:.4f} -> {top}")
+    print(f"sorting all of them: {time2:.4f}")
+    print()
+
+    # Merge-heavy workload: 100 shards of 1000 numbers merged 10 times
+    shards = [randomNumbers[i:i+1000] for i in range(0, n, 1000)]
+    time1 = getMergeTime(MaxHeap, shards, 10)
+    time2 = getMergeTime(PairingHeap, shards, 10)
+
+    print(f"Merging {len(shards)} shard heaps into one, 10 rounds")
+    print()
+    print(f"MaxHeap (extend): {time1:.4f}")
+    print(f"PairingHeap (meld): {time2:.4f}")
+    print()
+
+    # Producer/consumer throughput through the thread-safe and asyncio queues
+    print("Priority queue throughput (items per second, 20000 items per producer)")
+    print()
+    for producers, consumers in [(1, 1), (4, 4)]:
+        for batch in [1, 16]:
+            rate1 = getQueueThroughput(producers, consumers, 20000, batch)
+            rate2 = getAsyncQueueThroughput(producers, consumers, 20000, batch)
+            print(f"{producers} producers, {consumers} consumers, batches of {batch}: "
+                  f"threads {rate1:.0f}, asyncio {rate2:.0f}")
+    print()
+
+    # External sort with runs of 10000 numbers spilled to disk
+    startTime = time.time()
+    result = list(externalSort(randomNumbers, runSize=10000))
+    time1 = time.time() - startTime
+    print(f"External sort of {n} numbers in runs of 10000: {time1:.4f} (sorted: {result == sortedNums})")
+    print()
+
+    print("Indexed max heap: changing priorities and cancelling entries")
+    print()
+    jobs = IndexedMaxHeap()
+    handles = {name: jobs.insert(priority, name) for name, priority in
+               [("backup", 3), ("email", 5), ("build", 8), ("report", 1)]}
+    jobs.updatePriority(handles["report"], 10)
+    jobs.remove(handles["build"])
+    order = []
+    while jobs.getMax() is not None:
+        order.append(jobs.removeMaxHandle().item)
+    print(f"Jobs in order after raising 'report' and cancelling 'build': {order}")
+    print()
+
 if __name__ == '__main__':
     main()
\ No newline at end of file
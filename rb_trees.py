@@ -9,7 +9,11 @@
 # 5. Every path from a node to any of its descendant nil node has
 # the same number of black nodes (including the nil node in the count)
 
+from array import array
 from enum import Enum
+import struct
+import sys
+import threading
 
 # Create RED BLACK Types
 class Color(Enum):
@@ -30,12 +34,25 @@ class Node(object):
     def __str__(self):
         return str(self.key)
 
+# Snapshot file layout (all integers little-endian):
+#   header - magic, format version, number of nodes n
+#   keys   - the n keys in preorder, as signed 64-bit integers
+#   flags  - one byte per node in the same order: left child present,
+#            right child present, node is red
+SNAPSHOT_MAGIC = b'RBTS'
+SNAPSHOT_VERSION = 1
+SNAPSHOT_HEADER = struct.Struct('<4sHQ')
+SNAPSHOT_LEFT = 1
+SNAPSHOT_RIGHT = 2
+SNAPSHOT_RED = 4
+
 # Red Black Tree Class
 class RedBlackTree(object):
+    nodeType = Node # class used for new nodes (subclasses may attach extra state)
     
     def __init__(self):
         # make nil node and set properties
-        self.nil = Node(0)
+        self.nil = self.nodeType(0)
         self.nil.color = Color.BLACK
         self.nil.left = None
         self.nil.right = None
@@ -93,7 +110,7 @@ class RedBlackTree(object):
     
     def rbInsert(self, key):
         # create new node to be inserted and set left/right children to self.nil
-        z = Node(key)
+        z = self.nodeType(key)
         z.left = self.nil
         z.right = self.nil
         
@@ -172,12 +189,21 @@ class RedBlackTree(object):
                     z.p.p.color = Color.RED
                     self.leftRotate(z.p.p)
 
+        # report whether the root had to be recolored: that adds one to the
+        # black-height of the whole tree, which join keeps track of
+        grew = self.root.color == Color.RED
         self.root.color = Color.BLACK
+        return grew
     
     def treeMin(self, x):
         while x.left != self.nil:
             x = x.left
         return x
+
+    def treeMax(self, x):
+        while x.right != self.nil:
+            x = x.right
+        return x
     
     # Helps us move subtrees within the tree
     # Breaks links to 'u'
@@ -306,6 +332,371 @@ class RedBlackTree(object):
                     x = self.root
         x.color = Color.BLACK
     
+    ''' SEARCHING '''
+    
+    # returns the node holding 'key', or None if the key isn't in the tree
+    def rbSearch(self, key):
+        x = self.root
+        while x != self.nil and x.key != key:
+            x = x.left if key < x.key else x.right
+        return None if x == self.nil else x
+    
+    ''' ITERATING '''
+
+    # The iterators below step from node to node with the parent pointers,
+    # so they need no recursion and only constant extra memory. The tree
+    # must not be modified while one of them is running.
+
+    # returns the node after x in sorted order (nil if x is the last one)
+    def nextNode(self, x):
+        if x.right != self.nil:
+            return self.treeMin(x.right)
+        y = x.p
+        while y != self.nil and x == y.right:
+            x = y
+            y = y.p
+        return y
+
+    # returns the node before x in sorted order (nil if x is the first one)
+    def prevNode(self, x):
+        if x.left != self.nil:
+            return self.treeMax(x.left)
+        y = x.p
+        while y != self.nil and x == y.left:
+            x = y
+            y = y.p
+        return y
+
+    # yields the keys in increasing order
+    def __iter__(self):
+        if self.root == self.nil:
+            return
+        x = self.treeMin(self.root)
+        while x != self.nil:
+            yield x.key
+            x = self.nextNode(x)
+
+    # yields the keys in decreasing order
+    def __reversed__(self):
+        if self.root == self.nil:
+            return
+        x = self.treeMax(self.root)
+        while x != self.nil:
+            yield x.key
+            x = self.prevNode(x)
+
+    # PARAMETERS
+    # 'lo', 'hi' - inclusive bounds (None for no bound)
+    # yields the keys with lo <= key <= hi in increasing order
+    def iterRange(self, lo=None, hi=None):
+        if lo is None:
+            x = self.treeMin(self.root) if self.root != self.nil else self.nil
+        else:
+            x = self._ceilingNode(lo)
+        while x != self.nil and (hi is None or x.key <= hi):
+            yield x.key
+            x = self.nextNode(x)
+
+    # smallest node with key >= 'key' (strictly greater if not inclusive)
+    def _ceilingNode(self, key, inclusive=True):
+        x = self.root
+        best = self.nil
+        while x != self.nil:
+            if x.key > key or (inclusive and x.key == key):
+                best = x
+                x = x.left
+            else:
+                x = x.right
+        return best
+
+    # largest node with key <= 'key' (strictly smaller if not inclusive)
+    def _floorNode(self, key, inclusive=True):
+        x = self.root
+        best = self.nil
+        while x != self.nil:
+            if x.key < key or (inclusive and x.key == key):
+                best = x
+                x = x.right
+            else:
+                x = x.left
+        return best
+
+    # The lookups below return a key, or None if there is no such key
+
+    # largest key <= 'key'
+    def floor(self, key):
+        x = self._floorNode(key)
+        return None if x == self.nil else x.key
+
+    # smallest key >= 'key'
+    def ceiling(self, key):
+        x = self._ceilingNode(key)
+        return None if x == self.nil else x.key
+
+    # smallest key > 'key'
+    def successor(self, key):
+        x = self._ceilingNode(key, inclusive=False)
+        return None if x == self.nil else x.key
+
+    # largest key < 'key'
+    def predecessor(self, key):
+        x = self._floorNode(key, inclusive=False)
+        return None if x == self.nil else x.key
+
+    ''' JOINING AND SPLITTING '''
+
+    # The methods below work on bare subtrees, passed around as (root, bh)
+    # pairs where bh is the black-height of the root: the number of black
+    # nodes on any path from it down to nil, counting the root itself. All
+    # subtrees involved must use this tree's nil, and self.root is used as
+    # scratch space while a join rebalances.
+
+    def _blackHeight(self, x):
+        h = 0
+        while x != self.nil:
+            if x.color == Color.BLACK:
+                h += 1
+            x = x.left
+        return h
+
+    # PARAMETERS
+    # 'L', 'R' - subtree roots with every key in L < k.key < every key in R
+    # 'lbh', 'rbh' - their black-heights
+    # 'k' - detached node that goes between them
+    # returns the root and black-height of the joined subtree
+    def _join(self, L, lbh, k, R, rbh):
+        nil = self.nil
+        # blacken red roots so that k can safely be attached as a red node
+        if L.color == Color.RED:
+            L.color = Color.BLACK
+            lbh += 1
+        if R.color == Color.RED:
+            R.color = Color.BLACK
+            rbh += 1
+        if lbh == rbh:
+            k.left = L
+            k.right = R
+            k.p = nil
+            k.color = Color.BLACK
+            L.p = k
+            R.p = k
+            return k, lbh + 1
+        if lbh > rbh:
+            # walk down L's right spine to a black node as high (in black
+            # nodes) as R, and hang k there with that node and R as children
+            c = L
+            cbh = lbh
+            while not (c.color == Color.BLACK and cbh == rbh):
+                if c.color == Color.BLACK:
+                    cbh -= 1
+                parent = c
+                c = c.right
+            parent.right = k
+            k.left = c
+            k.right = R
+            top = L
+        else:
+            c = R
+            cbh = rbh
+            while not (c.color == Color.BLACK and cbh == lbh):
+                if c.color == Color.BLACK:
+                    cbh -= 1
+                parent = c
+                c = c.left
+            parent.left = k
+            k.left = L
+            k.right = c
+            top = R
+        k.p = parent
+        k.color = Color.RED
+        k.left.p = k
+        k.right.p = k
+        # k may now sit under a red parent, which is exactly what the insert
+        # fixup repairs
+        self.root = top
+        top.p = nil
+        grew = self.rbInsertFixup(k)
+        return self.root, max(lbh, rbh) + (1 if grew else 0)
+
+    # cuts x off from its children and returns them with their black-height
+    def _detach(self, x, bh):
+        left, right = x.left, x.right
+        left.p = self.nil
+        right.p = self.nil
+        return left, right, bh - (1 if x.color == Color.BLACK else 0)
+
+    # PARAMETERS
+    # 'x', 'bh' - subtree to split and its black-height
+    # 'key' - key to split at
+    # returns (L, lbh, node, R, rbh): the subtrees of keys smaller and larger
+    # than 'key', and the node holding 'key' (None if there is none)
+    def _split(self, x, bh, key):
+        nil = self.nil
+        if x == nil:
+            return nil, 0, None, nil, 0
+        left, right, cbh = self._detach(x, bh)
+        if key == x.key:
+            return left, cbh, x, right, cbh
+        if key < x.key:
+            L, lbh, found, R, rbh = self._split(left, cbh, key)
+            R, rbh = self._join(R, rbh, x, right, cbh)
+        else:
+            L, lbh, found, R, rbh = self._split(right, cbh, key)
+            L, lbh = self._join(left, cbh, x, L, lbh)
+        return L, lbh, found, R, rbh
+
+    # removes the largest node of x's subtree; returns (rest, restbh, node)
+    def _splitLast(self, x, bh):
+        left, right, cbh = self._detach(x, bh)
+        if right == self.nil:
+            return left, cbh, x
+        rest, restbh, last = self._splitLast(right, cbh)
+        rest, restbh = self._join(left, cbh, x, rest, restbh)
+        return rest, restbh, last
+
+    # joins two subtrees with every key in L < every key in R
+    def _join2(self, L, lbh, R, rbh):
+        if L == self.nil:
+            return R, rbh
+        rest, restbh, last = self._splitLast(L, lbh)
+        return self._join(rest, restbh, last, R, rbh)
+
+    # The set operations split one tree around the root of the other, recurse
+    # on the two halves and join the results. With m <= n keys this takes
+    # O(m log(n/m + 1)) time instead of the O(m log n) of inserting one by one.
+
+    def _union(self, a, abh, b, bbh):
+        nil = self.nil
+        if a == nil:
+            return b, bbh
+        if b == nil:
+            return a, abh
+        left, right, cbh = self._detach(a, abh)
+        bl, blbh, _, br, brbh = self._split(b, bbh, a.key)
+        L, lbh = self._union(left, cbh, bl, blbh)
+        R, rbh = self._union(right, cbh, br, brbh)
+        return self._join(L, lbh, a, R, rbh)
+
+    def _intersection(self, a, abh, b, bbh):
+        nil = self.nil
+        if a == nil or b == nil:
+            return nil, 0
+        left, right, cbh = self._detach(a, abh)
+        bl, blbh, found, br, brbh = self._split(b, bbh, a.key)
+        L, lbh = self._intersection(left, cbh, bl, blbh)
+        R, rbh = self._intersection(right, cbh, br, brbh)
+        if found is not None:
+            return self._join(L, lbh, a, R, rbh)
+        return self._join2(L, lbh, R, rbh)
+
+    def _difference(self, a, abh, b, bbh):
+        nil = self.nil
+        if a == nil:
+            return nil, 0
+        if b == nil:
+            return a, abh
+        left, right, cbh = self._detach(b, bbh)
+        al, albh, _, ar, arbh = self._split(a, abh, b.key)
+        L, lbh = self._difference(al, albh, left, cbh)
+        R, rbh = self._difference(ar, arbh, right, cbh)
+        return self._join2(L, lbh, R, rbh)
+
+    # PARAMETERS
+    # 'key' - key to split the tree at
+    # returns (left, found, right): trees with the keys smaller and larger
+    # than 'key', and whether 'key' itself was in the tree. This tree is
+    # left empty
+    def split(self, key):
+        _checkPlain(self)
+        L, _, found, R, _ = self._split(self.root, self._blackHeight(self.root), key)
+        self.root = self.nil
+        return self._withRoot(L), found is not None, self._withRoot(R)
+
+    # returns a new tree sharing this tree's nil with 'root' as its root
+    def _withRoot(self, root):
+        tree = type(self)()
+        tree.nil = self.nil
+        tree.root = root
+        root.p = self.nil
+        root.color = Color.BLACK
+        return tree
+
+    ''' SNAPSHOTS '''
+
+    # Writes the tree to 'path' in the snapshot format described above
+    def saveSnapshot(self, path):
+        keys = array('q')
+        flags = array('B')
+        stack = [self.root] if self.root != self.nil else []
+        while stack:
+            x = stack.pop()
+            keys.append(x.key)
+            flag = SNAPSHOT_RED if x.color == Color.RED else 0
+            if x.right != self.nil:
+                flag |= SNAPSHOT_RIGHT
+                stack.append(x.right)
+            if x.left != self.nil:
+                flag |= SNAPSHOT_LEFT
+                stack.append(x.left)
+            flags.append(flag)
+        if sys.byteorder == 'big':
+            keys.byteswap()
+        with open(path, 'wb') as f:
+            f.write(SNAPSHOT_HEADER.pack(SNAPSHOT_MAGIC, SNAPSHOT_VERSION, len(keys)))
+            keys.tofile(f)
+            flags.tofile(f)
+
+    # PARAMETERS
+    # 'path' - file written by saveSnapshot
+    # returns the tree, rebuilt in one pass over the file: the shape and
+    # colors are taken as stored, so no comparisons or fixups are needed
+    @classmethod
+    def loadSnapshot(cls, path):
+        with open(path, 'rb') as f:
+            header = f.read(SNAPSHOT_HEADER.size)
+            if len(header) == SNAPSHOT_HEADER.size:
+                magic, version, n = SNAPSHOT_HEADER.unpack(header)
+            if len(header) < SNAPSHOT_HEADER.size or magic != SNAPSHOT_MAGIC or version != SNAPSHOT_VERSION:
+                raise ValueError(f"{path} is not a red black tree snapshot")
+            # the arrays are filled straight from the file
+            keys = array('q')
+            flags = array('B')
+            try:
+                keys.fromfile(f, n)
+                flags.fromfile(f, n)
+            except (EOFError, ValueError): # ValueError if it ends mid-item
+                raise ValueError(f"{path} is truncated")
+        if sys.byteorder == 'big':
+            keys.byteswap()
+        tree = cls()
+        nil = tree.nil
+        nodeType = tree.nodeType
+        # (parent, is left side) of every child link still to be filled in;
+        # in preorder the next node always goes into the last one
+        slots = []
+        black = Color.BLACK # new nodes start out red
+        for key, flag in zip(keys, flags):
+            x = nodeType(key)
+            x.left = nil
+            x.right = nil
+            if not flag & SNAPSHOT_RED:
+                x.color = black
+            if slots:
+                parent, isLeft = slots.pop()
+                if isLeft:
+                    parent.left = x
+                else:
+                    parent.right = x
+                x.p = parent
+            else:
+                x.p = nil
+                tree.root = x
+            if flag & SNAPSHOT_RIGHT:
+                slots.append((x, False))
+            if flag & SNAPSHOT_LEFT:
+                slots.append((x, True))
+        return tree
+    
     def _printTree(self, node, level):
         if node is None:
             return
@@ -338,6 +729,690 @@ class RedBlackTree(object):
     def printTreeWithNil(self):
         self._printTreeWithNil(self.root, 0)      
     
+# Bulk operations on whole red black trees
+# All of these consume their input trees (they are left empty) and reuse
+# their nodes for the result. Keys are treated as a set. Subtree sizes are
+# not tracked, so they only work on plain RedBlackTrees.
+
+def _checkPlain(*trees):
+    for tree in trees:
+        if type(tree) is not RedBlackTree:
+            raise TypeError(f"expected a RedBlackTree, got {type(tree).__name__}")
+
+# yields every node of the tree (in no particular order)
+def _nodes(tree):
+    stack = [tree.root] if tree.root != tree.nil else []
+    while stack:
+        x = stack.pop()
+        yield x
+        if x.left != tree.nil:
+            stack.append(x.left)
+        if x.right != tree.nil:
+            stack.append(x.right)
+
+# Each tree has its own nil sentinel, so before two trees can be combined
+# the leaves of one have to point at the other's nil. Walking both trees in
+# step and relinking the one that runs out first costs O(min(n, m)).
+# returns the tree whose nil is kept
+def _shareNil(t1, t2):
+    if t1.nil is t2.nil:
+        return t1
+    walk1 = _nodes(t1)
+    walk2 = _nodes(t2)
+    while True:
+        if next(walk1, None) is None:
+            small, big = t1, t2
+            break
+        if next(walk2, None) is None:
+            small, big = t2, t1
+            break
+    for x in list(_nodes(small)):
+        if x.left == small.nil:
+            x.left = big.nil
+        if x.right == small.nil:
+            x.right = big.nil
+    small.root.p = big.nil
+    if small.root == small.nil:
+        small.root = big.nil
+    small.nil = big.nil
+    return big
+
+# combines t1 and t2 with 'setOp' (one of the RedBlackTree._union,
+# _intersection or _difference methods)
+def _combine(t1, t2, setOp):
+    _checkPlain(t1, t2)
+    holder = _shareNil(t1, t2)
+    root, _ = setOp(holder, t1.root, holder._blackHeight(t1.root),
+                     t2.root, holder._blackHeight(t2.root))
+    t1.root = t1.nil
+    t2.root = t2.nil
+    return holder._withRoot(root)
+
+# PARAMETERS
+# 't1', 't2' - trees with every key in t1 < k < every key in t2
+# 'k' - key that goes between them
+# returns a tree with the keys of t1, k and the keys of t2
+def join(t1, k, t2):
+    _checkPlain(t1, t2)
+    if t1.root != t1.nil and not t1.treeMax(t1.root).key < k:
+        raise ValueError("every key of t1 must be smaller than k")
+    if t2.root != t2.nil and not k < t2.treeMin(t2.root).key:
+        raise ValueError("every key of t2 must be larger than k")
+    holder = _shareNil(t1, t2)
+    node = holder.nodeType(k)
+    root, _ = holder._join(t1.root, holder._blackHeight(t1.root), node,
+                            t2.root, holder._blackHeight(t2.root))
+    t1.root = t1.nil
+    t2.root = t2.nil
+    return holder._withRoot(root)
+
+# returns a tree with every key that is in t1 or t2
+def union(t1, t2):
+    return _combine(t1, t2, RedBlackTree._union)
+
+# returns a tree with every key that is in both t1 and t2
+def intersection(t1, t2):
+    return _combine(t1, t2, RedBlackTree._intersection)
+
+# returns a tree with every key of t1 that is not in t2
+def difference(t1, t2):
+    return _combine(t1, t2, RedBlackTree._difference)
+
+# Order statistic tree: a red black tree where every node also stores the
+# size of its subtree (nil has size 0). With the sizes kept up to date through
+# rotations, inserts and deletes, the k-th smallest key and the number of
+# keys below a value can be found on a single root-to-leaf path.
+
+class OSNode(Node):
+    def __init__(self, key):
+        super().__init__(key)
+        self.size = 1
+
+class OrderStatisticTree(RedBlackTree):
+    nodeType = OSNode
+
+    def __init__(self):
+        super().__init__()
+        self.nil.size = 0
+
+    # a rotation only changes the subtrees of x and its old child y: y takes
+    # over x's size, and x's size is recomputed from its new children
+    def leftRotate(self, x):
+        super().leftRotate(x)
+        x.p.size = x.size
+        x.size = x.left.size + x.right.size + 1
+
+    def rightRotate(self, x):
+        super().rightRotate(x)
+        x.p.size = x.size
+        x.size = x.left.size + x.right.size + 1
+
+    ''' INSERTING '''
+
+    def rbInsert(self, key):
+        # every node on the path down to the new leaf gains one descendant;
+        # count it before the fixup starts rotating
+        x = self.root
+        while x != self.nil:
+            x.size += 1
+            x = x.left if key < x.key else x.right
+        super().rbInsert(key)
+
+    ''' DELETING '''
+
+    def _rbDelete(self, node, key):
+        z = self.nil
+        while node != self.nil:
+            if node.key == key:
+                z = node
+                break
+            elif node.key > key:
+                node = node.left
+            else:
+                node = node.right
+        if z == self.nil:
+            print("No such value in tree")
+            return
+        # y is the node that is actually spliced out (z, or z's successor
+        # when z has two children); all of y's ancestors lose one descendant
+        y = z if z.left == self.nil or z.right == self.nil else self.treeMin(z.right)
+        w = y.p
+        while w != self.nil:
+            w.size -= 1
+            w = w.p
+        # if y moves into z's place it takes over z's size
+        y.size = z.size
+        super()._rbDelete(z, key)
+
+    ''' SNAPSHOTS '''
+
+    # subtree sizes are not part of the snapshot, so they are recounted
+    # bottom up after the tree is rebuilt
+    @classmethod
+    def loadSnapshot(cls, path):
+        tree = super().loadSnapshot(path)
+        order = []
+        stack = [tree.root] if tree.root != tree.nil else []
+        while stack:
+            x = stack.pop()
+            order.append(x)
+            if x.left != tree.nil:
+                stack.append(x.left)
+            if x.right != tree.nil:
+                stack.append(x.right)
+        for x in reversed(order):
+            x.size = 1 + x.left.size + x.right.size
+        return tree
+
+    ''' ORDER STATISTICS '''
+
+    # PARAMETERS
+    # 'k' - rank of the key to find (1 = smallest)
+    # returns the k-th smallest key, or None if k is out of range
+    def select(self, k):
+        x = self.root
+        while x != self.nil:
+            r = x.left.size + 1 # rank of x within its own subtree
+            if k == r:
+                return x.key
+            elif k < r:
+                x = x.left
+            else:
+                k -= r
+                x = x.right
+        return None
+
+    # counts the keys below 'key' (and equal to it if 'inclusive' is True)
+    def _countBelow(self, key, inclusive):
+        count = 0
+        x = self.root
+        while x != self.nil:
+            if x.key < key or (inclusive and x.key == key):
+                # x and its whole left subtree are below key
+                count += x.left.size + 1
+                x = x.right
+            else:
+                x = x.left
+        return count
+
+    # returns the number of keys in the tree that are smaller than 'key'
+    def rank(self, key):
+        return self._countBelow(key, False)
+
+    # returns the number of keys k with lo <= k <= hi
+    def countRange(self, lo, hi):
+        if hi < lo:
+            return 0
+        return self._countBelow(hi, True) - self._countBelow(lo, False)
+
+# Red Black Tree stored as a struct of arrays
+# Instead of one Node object per key, node 'i' is the i-th entry of parallel
+# arrays: key[i], red[i] (1 = red, 0 = black), and the parent/left/right
+# *indices* p[i], left[i], right[i]. Index 0 plays the part of the nil
+# sentinel, and the slots of deleted nodes are kept on a free list for reuse.
+# Keys are stored as signed 64-bit integers, and indices as C ints (4 bytes on
+# common platforms, half the size of a C long on 64-bit Linux and macOS).
+
+NIL = 0
+
+class ArrayRedBlackTree(object):
+
+    def __init__(self):
+        # slot 0 is the black nil sentinel
+        self.key = array('q', [0])
+        self.red = array('b', [0])
+        self.p = array('i', [NIL])
+        self.left = array('i', [NIL])
+        self.right = array('i', [NIL])
+        self.free = [] # slots of deleted nodes
+        self.root = NIL
+
+    def _newNode(self, key):
+        if self.free:
+            z = self.free.pop()
+            self.key[z] = key
+            self.red[z] = 1
+            self.p[z] = self.left[z] = self.right[z] = NIL
+            return z
+        self.key.append(key)
+        self.red.append(1)
+        self.p.append(NIL)
+        self.left.append(NIL)
+        self.right.append(NIL)
+        return len(self.key) - 1
+
+    def leftRotate(self, x):
+        p, left, right = self.p, self.left, self.right
+        y = right[x]
+        right[x] = left[y]
+        if left[y] != NIL:
+            p[left[y]] = x
+        p[y] = p[x]
+        if p[x] == NIL:
+            self.root = y
+        elif x == left[p[x]]:
+            left[p[x]] = y
+        else:
+            right[p[x]] = y
+        left[y] = x
+        p[x] = y
+
+    def rightRotate(self, x):
+        p, left, right = self.p, self.left, self.right
+        y = left[x]
+        left[x] = right[y]
+        if right[y] != NIL:
+            p[right[y]] = x
+        p[y] = p[x]
+        if p[x] == NIL:
+            self.root = y
+        elif x == right[p[x]]:
+            right[p[x]] = y
+        else:
+            left[p[x]] = y
+        right[y] = x
+        p[x] = y
+
+    ''' INSERTING '''
+
+    def rbInsert(self, key):
+        z = self._newNode(key)
+        keys, left, right = self.key, self.left, self.right
+        y = NIL
+        x = self.root
+        while x != NIL:
+            y = x
+            x = left[x] if key < keys[x] else right[x]
+        self.p[z] = y
+        if y == NIL:
+            self.root = z
+        elif key < keys[y]:
+            left[y] = z
+        else:
+            right[y] = z
+        self.rbInsertFixup(z)
+
+    def rbInsertFixup(self, z):
+        red, p, left, right = self.red, self.p, self.left, self.right
+        while red[p[z]]:
+            zp = p[z]
+            zpp = p[zp]
+            if zp == left[zpp]:
+                y = right[zpp] # uncle
+                if red[y]:
+                    red[zp] = 0
+                    red[y] = 0
+                    red[zpp] = 1
+                    z = zpp
+                else:
+                    if z == right[zp]:
+                        z = zp
+                        self.leftRotate(z)
+                    red[p[z]] = 0
+                    red[p[p[z]]] = 1
+                    self.rightRotate(p[p[z]])
+            else:
+                y = left[zpp] # uncle
+                if red[y]:
+                    red[zp] = 0
+                    red[y] = 0
+                    red[zpp] = 1
+                    z = zpp
+                else:
+                    if z == left[zp]:
+                        z = zp
+                        self.rightRotate(z)
+                    red[p[z]] = 0
+                    red[p[p[z]]] = 1
+                    self.leftRotate(p[p[z]])
+        red[self.root] = 0
+
+    def treeMin(self, x):
+        left = self.left
+        while left[x] != NIL:
+            x = left[x]
+        return x
+
+    def rbTransplant(self, u, v):
+        p = self.p
+        if p[u] == NIL:
+            self.root = v
+        elif u == self.left[p[u]]:
+            self.left[p[u]] = v
+        else:
+            self.right[p[u]] = v
+        p[v] = p[u]
+
+    ''' SEARCHING '''
+
+    # returns the slot holding 'key', or None if the key isn't in the tree
+    def rbSearch(self, key):
+        keys, left, right = self.key, self.left, self.right
+        x = self.root
+        while x != NIL and keys[x] != key:
+            x = left[x] if key < keys[x] else right[x]
+        return None if x == NIL else x
+
+    ''' DELETING '''
+
+    def rbDelete(self, key):
+        z = self.rbSearch(key)
+        if z is None:
+            print("No such value in tree")
+            return
+        red, p, left, right = self.red, self.p, self.left, self.right
+        y = z
+        yOrigRed = red[y]
+        if left[z] == NIL:
+            x = right[z]
+            self.rbTransplant(z, right[z])
+        elif right[z] == NIL:
+            x = left[z]
+            self.rbTransplant(z, left[z])
+        else:
+            y = self.treeMin(right[z])
+            yOrigRed = red[y]
+            x = right[y]
+            if p[y] == z:
+                p[x] = y
+            else:
+                self.rbTransplant(y, right[y])
+                right[y] = right[z]
+                p[right[y]] = y
+            self.rbTransplant(z, y)
+            left[y] = left[z]
+            p[left[y]] = y
+            red[y] = red[z]
+        if not yOrigRed:
+            self.rbDeleteFixup(x)
+        # give z's slot back for reuse
+        p[z] = left[z] = right[z] = NIL
+        self.free.append(z)
+
+    def rbDeleteFixup(self, x):
+        red, p, left, right = self.red, self.p, self.left, self.right
+        while x != self.root and not red[x]:
+            if x == left[p[x]]:
+                w = right[p[x]]
+                if red[w]:
+                    red[w] = 0
+                    red[p[x]] = 1
+                    self.leftRotate(p[x])
+                    w = right[p[x]]
+                if not red[left[w]] and not red[right[w]]:
+                    red[w] = 1
+                    x = p[x]
+                else:
+                    if not red[right[w]]:
+                        red[left[w]] = 0
+                        red[w] = 1
+                        self.rightRotate(w)
+                        w = right[p[x]]
+                    red[w] = red[p[x]]
+                    red[p[x]] = 0
+                    red[right[w]] = 0
+                    self.leftRotate(p[x])
+                    x = self.root
+            else:
+                w = left[p[x]]
+                if red[w]:
+                    red[w] = 0
+                    red[p[x]] = 1
+                    self.rightRotate(p[x])
+                    w = left[p[x]]
+                if not red[right[w]] and not red[left[w]]:
+                    red[w] = 1
+                    x = p[x]
+                else:
+                    if not red[left[w]]:
+                        red[right[w]] = 0
+                        red[w] = 1
+                        self.leftRotate(w)
+                        w = left[p[x]]
+                    red[w] = red[p[x]]
+                    red[p[x]] = 0
+                    red[left[w]] = 0
+                    self.rightRotate(p[x])
+                    x = self.root
+        red[x] = 0
+
+    ''' PRINTING '''
+
+    def _printTree(self, x, level):
+        if x == NIL:
+            return
+        self._printTree(self.right[x], level + 1)
+        print('    ' * level + str(self.key[x]) + ('.R' if self.red[x] else '.B'))
+        self._printTree(self.left[x], level + 1)
+
+    def printTree(self):
+        self._printTree(self.root, 0)
+
+# Persistent red black tree
+# Nodes are never changed once they are part of a tree. An insert or delete
+# copies the O(log n) nodes on the path from the root to the change and
+# shares every other subtree with the previous version, so old versions stay
+# valid. A snapshot is just the root of the current version: readers can walk
+# it without any locking while a writer keeps building new versions.
+# Empty subtrees are None, and nodes have no parent pointers since one node
+# can be part of many versions. Keys are treated as a set.
+
+class PersistentNode(object):
+
+    def __init__(self, color, left, key, right):
+        self.color = color
+        self.left = left
+        self.key = key
+        self.right = right
+
+    def __str__(self):
+        return str(self.key)
+
+def _isRed(x):
+    return x is not None and x.color == Color.RED
+
+def _red(left, key, right):
+    return PersistentNode(Color.RED, left, key, right)
+
+def _black(left, key, right):
+    return PersistentNode(Color.BLACK, left, key, right)
+
+# Builds a black node from 'left', 'key' and 'right'. If that leaves a red
+# node with a red child right below it, the three are rebuilt as a red node
+# with two black children instead (the path copying version of the insert
+# fixup rotations)
+def _balance(left, key, right):
+    if _isRed(left) and _isRed(right):
+        return _red(_black(left.left, left.key, left.right), key,
+                    _black(right.left, right.key, right.right))
+    if _isRed(left):
+        if _isRed(left.left):
+            a = left.left
+            return _red(_black(a.left, a.key, a.right), left.key,
+                        _black(left.right, key, right))
+        if _isRed(left.right):
+            b = left.right
+            return _red(_black(left.left, left.key, b.left), b.key,
+                        _black(b.right, key, right))
+    if _isRed(right):
+        if _isRed(right.right):
+            d = right.right
+            return _red(_black(left, key, right.left), right.key,
+                        _black(d.left, d.key, d.right))
+        if _isRed(right.left):
+            c = right.left
+            return _red(_black(left, key, c.left), c.key,
+                        _black(c.right, right.key, right.right))
+    return _black(left, key, right)
+
+# turns a black node red, lowering its black-height by one
+def _sub1(x):
+    assert x.color == Color.BLACK
+    return _red(x.left, x.key, x.right)
+
+# rebuilds a node whose left subtree just lost one black-height
+def _balLeft(left, key, right):
+    if _isRed(left):
+        return _red(_black(left.left, left.key, left.right), key, right)
+    if not _isRed(right):
+        return _balance(left, key, _sub1(right))
+    b = right.left
+    return _red(_black(left, key, b.left), b.key,
+                _balance(b.right, right.key, _sub1(right.right)))
+
+# rebuilds a node whose right subtree just lost one black-height
+def _balRight(left, key, right):
+    if _isRed(right):
+        return _red(left, key, _black(right.left, right.key, right.right))
+    if not _isRed(left):
+        return _balance(_sub1(left), key, right)
+    b = left.right
+    return _red(_balance(_sub1(left.left), left.key, b.left), b.key,
+                _black(b.right, key, right))
+
+# glues together the two subtrees of a deleted node
+def _append(a, b):
+    if a is None:
+        return b
+    if b is None:
+        return a
+    if _isRed(a) and _isRed(b):
+        bc = _append(a.right, b.left)
+        if _isRed(bc):
+            return _red(_red(a.left, a.key, bc.left), bc.key,
+                        _red(bc.right, b.key, b.right))
+        return _red(a.left, a.key, _red(bc, b.key, b.right))
+    if not _isRed(a) and not _isRed(b):
+        bc = _append(a.right, b.left)
+        if _isRed(bc):
+            return _red(_black(a.left, a.key, bc.left), bc.key,
+                        _black(bc.right, b.key, b.right))
+        return _balLeft(a.left, a.key, _black(bc, b.key, b.right))
+    if _isRed(b):
+        return _red(_append(a, b.left), b.key, b.right)
+    return _red(a.left, a.key, _append(a.right, b))
+
+# returns the new version of subtree x with 'key' added (x itself if the
+# key was already there)
+def _insert(x, key):
+    if x is None:
+        return _red(None, key, None)
+    if key < x.key:
+        left = _insert(x.left, key)
+        if left is x.left:
+            return x
+        if x.color == Color.BLACK:
+            return _balance(left, x.key, x.right)
+        return _red(left, x.key, x.right)
+    if key > x.key:
+        right = _insert(x.right, key)
+        if right is x.right:
+            return x
+        if x.color == Color.BLACK:
+            return _balance(x.left, x.key, right)
+        return _red(x.left, x.key, right)
+    return x
+
+# returns the new version of subtree x without 'key', which must be in it
+def _delete(x, key):
+    if key < x.key:
+        if x.left.color == Color.BLACK:
+            return _balLeft(_delete(x.left, key), x.key, x.right)
+        return _red(_delete(x.left, key), x.key, x.right)
+    if key > x.key:
+        if x.right.color == Color.BLACK:
+            return _balRight(x.left, x.key, _delete(x.right, key))
+        return _red(x.left, x.key, _delete(x.right, key))
+    return _append(x.left, x.right)
+
+# Read-only view of one version of a persistent tree
+class RedBlackSnapshot(object):
+
+    def __init__(self, root):
+        self.root = root
+
+    # returns the node holding 'key', or None if the key isn't in the tree
+    def rbSearch(self, key):
+        x = self.root
+        while x is not None and x.key != key:
+            x = x.left if key < x.key else x.right
+        return x
+
+    def __contains__(self, key):
+        return self.rbSearch(key) is not None
+
+    # yields the keys in increasing order (with no parent pointers, the path
+    # back up is kept on a stack of O(log n) nodes)
+    def __iter__(self):
+        return self.iterRange()
+
+    # PARAMETERS
+    # 'lo', 'hi' - inclusive bounds (None for no bound)
+    # yields the keys with lo <= key <= hi in increasing order
+    def iterRange(self, lo=None, hi=None):
+        stack = []
+        x = self.root
+        while True:
+            while x is not None:
+                if lo is not None and x.key < lo:
+                    x = x.right
+                else:
+                    stack.append(x)
+                    x = x.left
+            if not stack:
+                return
+            x = stack.pop()
+            if hi is not None and x.key > hi:
+                return
+            yield x.key
+            x = x.right
+
+    def _printTree(self, node, level):
+        if node is None:
+            return
+        self._printTree(node.right, level + 1)
+        color = '.R' if node.color == Color.RED else '.B'
+        print('    ' * level + str(node) + color)
+        self._printTree(node.left, level + 1)
+
+    def printTree(self):
+        self._printTree(self.root, 0)
+
+class PersistentRedBlackTree(RedBlackSnapshot):
+
+    def __init__(self):
+        super().__init__(None)
+        # writers are serialized; readers never take this lock
+        self.writeLock = threading.Lock()
+
+    # returns a view of the current version in O(1). It does not change when
+    # the tree is modified later on
+    def snapshot(self):
+        return RedBlackSnapshot(self.root)
+
+    ''' INSERTING '''
+
+    def rbInsert(self, key):
+        with self.writeLock:
+            root = _insert(self.root, key)
+            if root.color == Color.RED:
+                root = _black(root.left, root.key, root.right)
+            # publishing the new version is a single assignment, so readers
+            # see either the old root or the new one
+            self.root = root
+
+    ''' DELETING '''
+
+    def rbDelete(self, key):
+        with self.writeLock:
+            if self.rbSearch(key) is None:
+                print("No such value in tree")
+                return
+            root = _delete(self.root, key)
+            if root is not None and root.color == Color.RED:
+                root = _black(root.left, root.key, root.right)
+            self.root = root
+
 def main():
     print("Let 'R' denote a red note")
     print("Let 'B' denote a black node")
@@ -394,6 +1469,49 @@ def main():
     rb1.rbInsert(7)
     rb1.rbInsert(3)
     rb1.printTree()
+    print()
+    print("Same insertion sequence with the array-backed tree:")
+    rb2 = ArrayRedBlackTree()
+    for key in [26, 41, 17, 21, 14, 47, 30, 28, 38, 19, 23, 10, 16, 15, 20, 35, 39, 12, 7, 3]:
+        rb2.rbInsert(key)
+    rb2.printTree()
+    print()
+    print("Order statistics over the same keys:")
+    ost = OrderStatisticTree()
+    for key in [26, 41, 17, 21, 14, 47, 30, 28, 38, 19, 23, 10, 16, 15, 20, 35, 39, 12, 7, 3]:
+        ost.rbInsert(key)
+    print(f"5th smallest key: {ost.select(5)}")
+    print(f"keys smaller than 30: {ost.rank(30)}")
+    print(f"keys between 15 and 35: {ost.countRange(15, 35)}")
+    print(f"keys from 15 to 35 in order: {list(ost.iterRange(15, 35))}")
+    print(f"largest key <= 25: {ost.floor(25)}, smallest key > 41: {ost.successor(41)}")
+    print()
+    print("Union of the keys 1-10 and the odd keys 5-15:")
+    a = RedBlackTree()
+    b = RedBlackTree()
+    for key in range(1, 11):
+        a.rbInsert(key)
+    for key in range(5, 16, 2):
+        b.rbInsert(key)
+    u = union(a, b)
+    u.printTree()
+    left, found, right = u.split(8)
+    print(f"split at 8 (found: {found}), left part:")
+    left.printTree()
+    print("right part:")
+    right.printTree()
+    print("joined back together around 8:")
+    join(left, 8, right).printTree()
+    print()
+    print("Persistent tree: a snapshot taken after inserting 1-7 is unaffected by later changes")
+    prb = PersistentRedBlackTree()
+    for key in range(1, 8):
+        prb.rbInsert(key)
+    before = prb.snapshot()
+    prb.rbDelete(4)
+    prb.rbInsert(8)
+    print(f"snapshot: {list(before)}")
+    print(f"current:  {list(prb)}")
     
 if __name__ == '__main__':
     main()